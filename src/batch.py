@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+from board import SudokuBoard
+from solver_registry import AUTO, create_solver
+from file_io import iter_puzzle_lines, parse_puzzle_line, board_to_line
+from vectorized import HAS_NUMPY, solve_lines
+from solve_cache import SolveCache
+from solve_limits import SolveLimits, SolveStatus
+from solve_stats import SolveStats
+from lang_manager import get_text, get_language_manager
+
+
+# ワーカープロセスごとの解答キャッシュ（チャンクをまたいで使い回す）
+_CACHE = None
+
+
+def _get_cache(cache_size: int) -> Optional[SolveCache]:
+    """このプロセスの解答キャッシュを返す（cache_size が 0 以下なら None）"""
+    global _CACHE
+    if cache_size <= 0:
+        return None
+    if _CACHE is None or _CACHE.maxsize != cache_size:
+        _CACHE = SolveCache(cache_size)
+    return _CACHE
+
+
+def solve_puzzle_line(line: str, solver_name: str = AUTO, cache: Optional[SolveCache] = None,
+                      limits: Optional[SolveLimits] = None, stats: Optional[SolveStats] = None) -> Tuple[str, str]:
+    """1 行形式の問題を解き、出力用の 1 行と結果の種類（SolveStatus）を返す
+    
+    Args:
+        line: 1 行形式の問題
+        solver_name: 使用するソルバー名
+        cache: 解答キャッシュ（指定した場合は同じ、または対称な問題の結果を再利用する）
+        limits: 1 問あたりの探索の上限
+        stats: 指定すると探索の統計を加算する
+    
+    Returns:
+        (str, str): 出力用の 1 行は、解けた場合は解答の 81 文字。解がない場合や上限に達した場合は
+                    問題をそのまま（0 を含む 81 文字）、形式が不正な場合は空文字列
+    """
+    try:
+        board = SudokuBoard(parse_puzzle_line(line))
+    except ValueError:
+        return "", SolveStatus.INVALID
+    if not board.validate_full_board():
+        return board_to_line(board.to_list()), SolveStatus.UNSOLVABLE
+    if cache is not None:
+        result = cache.solve(board, solver_name, limits, stats)
+    else:
+        result = create_solver(board, solver_name).solve_with_limits(limits, stats=stats)
+    return board_to_line(board.to_list()), result.status
+
+
+def _solve_chunk(lines: List[str], solver_name: str, cache_size: int, limits: Optional[SolveLimits],
+                 collect_stats: bool) -> Tuple[List[Tuple[str, str]], Optional[SolveStats]]:
+    """ワーカープロセスで問題のまとまり（チャンク）を解き、結果とチャンクの統計を返す
+    
+    NumPy があればチャンク全体に naked single の伝播を一括で適用し、残りだけを探索する。
+    探索はプロセスごとの解答キャッシュを通して行う。
+    """
+    cache = _get_cache(cache_size)
+    stats = SolveStats() if collect_stats else None
+    if HAS_NUMPY:
+        return solve_lines(lines, solver_name, cache, limits, stats), stats
+    return [solve_puzzle_line(line, solver_name, cache, limits, stats) for line in lines], stats
+
+
+def _iter_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """行の列を chunk_size 行ずつのリストに分ける"""
+    it = iter(lines)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_solved_lines(lines: Iterable[str], jobs: int = 1, chunk_size: int = 256,
+                      solver_name: str = AUTO, cache_size: int = 4096,
+                      limits: Optional[SolveLimits] = None,
+                      stats: Optional[SolveStats] = None) -> Iterator[Tuple[str, str]]:
+    """問題の行を解き、結果の行と結果の種類（SolveStatus）の組を入力と同じ順序で返す
+    
+    jobs が 2 以上の場合はプロセスプールでチャンク単位に並列に解く。
+    同時に投入するチャンク数を jobs * 2 に抑えるため、入力全体をメモリに載せずに処理できる。
+    
+    Args:
+        lines: 1 行形式の問題の列
+        jobs: ワーカープロセス数
+        chunk_size: 1 回の作業単位とする問題数
+        solver_name: 使用するソルバー名
+        cache_size: ワーカープロセスごとの解答キャッシュの大きさ（0 で無効）
+        limits: 1 問あたりの探索の上限（中断トークンはプロセス間で共有できないため指定しない）
+        stats: 指定すると各ワーカーの探索の統計を合計する
+    """
+    def collect(chunk_result):
+        results, chunk_stats = chunk_result
+        if stats is not None:
+            stats.merge(chunk_stats)
+        return results
+    
+    collect_stats = stats is not None
+    chunks = _iter_chunks(lines, chunk_size)
+    if jobs <= 1:
+        for chunk in chunks:
+            yield from collect(_solve_chunk(chunk, solver_name, cache_size, limits, collect_stats))
+        return
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_solve_chunk, chunk, solver_name, cache_size, limits, collect_stats))
+            if len(pending) >= jobs * 2:
+                yield from collect(pending.popleft().result())
+        while pending:
+            yield from collect(pending.popleft().result())
+
+
+def run_batch(input_file: str, output_file: Optional[str] = None, jobs: Optional[int] = None,
+              chunk_size: int = 256, solver_name: str = AUTO, language: str = None,
+              cache_size: int = 4096, timeout: Optional[float] = None, max_nodes: Optional[int] = None,
+              verbose: bool = False) -> None:
+    """問題集ファイル（1 行 1 問）をまとめて解き、解答を入力順に書き出す
+    
+    Args:
+        input_file: 問題集ファイルのパス
+        output_file: 出力先ファイルのパス（省略時は標準出力）
+        jobs: ワーカープロセス数（省略時は CPU 数）
+        chunk_size: 1 回の作業単位とする問題数
+        solver_name: 使用するソルバー名
+        language: 言語設定
+        cache_size: ワーカープロセスごとの解答キャッシュの大きさ（0 で無効）
+        timeout: 1 問あたりの制限時間（秒）
+        max_nodes: 1 問あたりの探索ノード数の上限
+        verbose: True の場合、全ワーカーの探索の統計を合計して表示する
+    """
+    # 言語設定を初期化（引数で指定された場合のみ）
+    if language:
+        get_language_manager(language)
+    
+    jobs = jobs or os.cpu_count() or 1
+    print(get_text("console.messages", "batch_started", None, input_file, jobs), file=sys.stderr)
+    
+    limits = None
+    if timeout is not None or max_nodes is not None:
+        limits = SolveLimits(timeout=timeout, max_nodes=max_nodes)
+    
+    counts = Counter()
+    stats = SolveStats() if verbose else None
+    start_time = time.time()
+    out: TextIO = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
+    try:
+        lines = iter_puzzle_lines(input_file)
+        for result, status in iter_solved_lines(lines, jobs, chunk_size, solver_name, cache_size, limits, stats):
+            counts[status] += 1
+            out.write(result + '\n')
+    finally:
+        if output_file:
+            out.close()
+    
+    elapsed_time = time.time() - start_time
+    print(get_text("console.messages", "batch_summary", None, sum(counts.values()), counts[SolveStatus.SOLVED],
+                   counts[SolveStatus.UNSOLVABLE], counts[SolveStatus.BUDGET_EXCEEDED],
+                   counts[SolveStatus.INVALID], elapsed_time),
+          file=sys.stderr)
+    if stats is not None:
+        for line in stats.summary_lines():
+            print(line, file=sys.stderr)
@@ -3,38 +3,345 @@ from file_io import load_board_from_file
 from lang_manager import get_text
 
 
+# 対応する盤面の大きさ（1 辺のマス数。ブロックは √size × √size）
+SUPPORTED_SIZES = (4, 9, 16, 25)
+
+# 候補数の表を作る盤面の大きさの上限（これより大きい盤面は int.bit_count で数える）
+MAX_POPCOUNT_TABLE_SIZE = 16
+
+# 全数字（1-9）がそろったビットマスク。数字 n はビット (n - 1) に対応する
+ALL_DIGITS = 0x1FF
+
+# セル (row, col) が属するブロック番号の表
+BOX_INDEX = [[(row // 3) * 3 + col // 3 for col in range(9)] for row in range(9)]
+
+# ビットマスクごとの候補数（立っているビット数）の表
+POPCOUNT = [bin(mask).count("1") for mask in range(ALL_DIGITS + 1)]
+
+
+class _BitCounter:
+    """POPCOUNT と同じく popcount[mask] で候補数を返す（表が大きすぎる盤面用）"""
+    
+    def __getitem__(self, mask: int) -> int:
+        return mask.bit_count()
+
+
+# 盤面の大きさごとの (ブロック番号の表, 候補数の表)
+_TABLES = {9: (BOX_INDEX, POPCOUNT)}
+
+
+def box_size_of(size: int) -> int:
+    """盤面の大きさからブロックの 1 辺のマス数を返す"""
+    return int(round(size ** 0.5))
+
+
+def board_tables(size: int):
+    """盤面の大きさに対応する (ブロック番号の表, 候補数の表) を返す"""
+    tables = _TABLES.get(size)
+    if tables is None:
+        box = box_size_of(size)
+        box_index = [[(row // box) * box + col // box for col in range(size)] for row in range(size)]
+        if size <= MAX_POPCOUNT_TABLE_SIZE:
+            popcount = [bin(mask).count("1") for mask in range(1 << size)]
+        else:
+            popcount = _BitCounter()
+        tables = _TABLES[size] = (box_index, popcount)
+    return tables
+
+
+def mask_to_digits(mask: int) -> List[int]:
+    """ビットマスクを数字のリストに変換"""
+    return [num for num in range(1, mask.bit_length() + 1) if mask & (1 << (num - 1))]
+
+
+class BoardView:
+    """SudokuBoard の盤面を board[i][j] の形で読み書きするビュー（行は RowView）
+    
+    値はコピーせず元の盤面を参照する。書き込みは SudokuBoard.set_value を通るため、
+    使用済み数字のマスクと重複の数も更新される。
+    """
+    __slots__ = ("_owner",)
+    
+    def __init__(self, owner: "SudokuBoard"):
+        self._owner = owner
+    
+    def __len__(self) -> int:
+        return self._owner.size
+    
+    def __getitem__(self, row: int) -> "RowView":
+        size = self._owner.size
+        if row < 0:
+            row += size
+        if not 0 <= row < size:
+            raise IndexError(row)
+        return RowView(self._owner, row)
+    
+    def __iter__(self):
+        owner = self._owner
+        for row in range(owner.size):
+            yield RowView(owner, row)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BoardView):
+            return self._owner._cells == other._owner._cells and self._owner.size == other._owner.size
+        try:
+            return self._owner.to_list() == [list(row) for row in other]
+        except TypeError:
+            return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return repr(self._owner.to_list())
+
+
+class RowView:
+    """BoardView の 1 行（row[j] で読み書きし、row[:] で値のリストを返す）"""
+    __slots__ = ("_owner", "_row")
+    
+    def __init__(self, owner: "SudokuBoard", row: int):
+        self._owner = owner
+        self._row = row
+    
+    def __len__(self) -> int:
+        return self._owner.size
+    
+    def __getitem__(self, col):
+        owner = self._owner
+        size = owner.size
+        start = self._row * size
+        if isinstance(col, slice):
+            return list(owner._cells[start:start + size])[col]
+        if col < 0:
+            col += size
+        if not 0 <= col < size:
+            raise IndexError(col)
+        return owner._cells[start + col]
+    
+    def __setitem__(self, col: int, value: int) -> None:
+        if col < 0:
+            col += self._owner.size
+        self._owner.set_value(self._row, col, value)
+    
+    def __iter__(self):
+        owner = self._owner
+        start = self._row * owner.size
+        return iter(owner._cells[start:start + owner.size])
+    
+    def __eq__(self, other) -> bool:
+        try:
+            return self[:] == list(other)
+        except TypeError:
+            return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return repr(self[:])
+
+
 class SudokuBoard:
-    def __init__(self, board: List[List[int]] = None):
+    """数独の盤面（セルの値は 1 マス 1 バイトの平坦な bytearray に行優先で保持する）
+    
+    board プロパティは board[i][j] の形で読み書きできるビューを返す。
+    コピー・比較・ハッシュ・pickle はバイト列をそのまま扱うため、盤面の大きさに対して軽い。
+    checkpoint() から release() までの間は変更を記録し、rollback() で記録した位置まで
+    変更した数に比例する手間で戻せる（盤面をコピーせずに試行と取り消しを繰り返せる）。
+    """
+    __slots__ = ("size", "box_size", "all_digits", "box_index", "popcount", "_cells", "_original",
+                 "_row_counts", "_col_counts", "_box_counts", "row_masks", "col_masks", "box_masks",
+                 "conflicts", "_trail", "_trail_depth")
+    
+    def __init__(self, board: List[List[int]] = None, size: int = 9):
+        """
+        Args:
+            board: 盤面の 2 次元リスト（0 は空きマス）。省略時は空の盤面
+            size: board を省略した場合の盤面の大きさ（SUPPORTED_SIZES のいずれか）
+        """
         if board is None:
-            self.board = [[0 for _ in range(9)] for _ in range(9)]
+            if size not in SUPPORTED_SIZES:
+                raise ValueError(get_text("board.errors", "invalid_rows"))
+            self._set_size(size)
+            self._cells = bytearray(size * size)
         else:
             self.validate_board_format(board)
-            self.board = [row[:] for row in board]
-        
-        self.original_board = [row[:] for row in self.board]
+            self._set_size(len(board))
+            self._cells = bytearray(num for row in board for num in row)
+        self._rebuild_masks()
+        self._original = bytes(self._cells)
+        self._trail = None
+        self._trail_depth = 0
+    
+    def _set_size(self, size: int) -> None:
+        """盤面の大きさと、それに応じた表を設定"""
+        self.size = size
+        self.box_size = box_size_of(size)
+        self.all_digits = (1 << size) - 1
+        self.box_index, self.popcount = board_tables(size)
+    
+    @classmethod
+    def from_bytes(cls, size: int, cells: bytes, original: Optional[bytes] = None) -> "SudokuBoard":
+        """行優先のバイト列（to_bytes() の値）から盤面を作成（original を省略すると cells を初期盤面とする）"""
+        board = cls.__new__(cls)
+        board._set_size(size)
+        board._cells = bytearray(cells)
+        board._rebuild_masks()
+        board._original = bytes(cells if original is None else original)
+        board._trail = None
+        board._trail_depth = 0
+        return board
+    
+    def __reduce__(self):
+        # ワーカープロセスにはバイト列だけを送り、マスクは受け取った側で作り直す
+        return (SudokuBoard.from_bytes, (self.size, bytes(self._cells), self._original))
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SudokuBoard):
+            return NotImplemented
+        return self.size == other.size and self._cells == other._cells
+    
+    def __hash__(self) -> int:
+        # 現在の盤面の値から計算する（辞書のキーにする場合は、その間盤面を変更しないこと）
+        return hash((self.size, bytes(self._cells)))
+    
+    @property
+    def board(self) -> BoardView:
+        return BoardView(self)
+    
+    @board.setter
+    def board(self, board) -> None:
+        # 大きさが違う盤面や範囲外の数字は受け付けない（ValueError）
+        if isinstance(board, BoardView):
+            if board._owner.size != self.size:
+                raise ValueError(get_text("board.errors", "size_mismatch", None, self.size))
+            self._load_cells(board._owner._cells)
+        else:
+            if len(board) != self.size:
+                raise ValueError(get_text("board.errors", "size_mismatch", None, self.size))
+            self.validate_board_format(board)
+            self._load_cells(bytes(num for row in board for num in row))
+    
+    @property
+    def original_board(self) -> List[List[int]]:
+        """初期盤面（読み込み・作成・copy() の時点の盤面）の 2 次元リスト"""
+        size = self.size
+        return [list(self._original[i * size:(i + 1) * size]) for i in range(size)]
+    
+    def _load_cells(self, cells: bytes) -> None:
+        """盤面を丸ごと差し替え、制約状態を作り直す（変更の記録中は変わったセルを記録する）"""
+        if self._trail is not None:
+            old_cells = self._cells
+            self._trail.extend((idx, old) for idx, (old, new) in enumerate(zip(old_cells, cells)) if old != new)
+        self._cells[:] = cells
+        self._rebuild_masks()
+    
+    def to_list(self) -> List[List[int]]:
+        """現在の盤面の 2 次元リストを返す"""
+        size = self.size
+        cells = self._cells
+        return [list(cells[i * size:(i + 1) * size]) for i in range(size)]
+    
+    def count_filled(self) -> int:
+        """数字が入っているセルの数を返す"""
+        return len(self._cells) - self._cells.count(0)
+    
+    def to_bytes(self) -> bytes:
+        """現在の盤面の行優先のバイト列を返す"""
+        return bytes(self._cells)
+    
+    def _rebuild_masks(self) -> None:
+        """行・列・ブロックごとの使用済み数字のビットマスクを再構築"""
+        # 各ユニットでの数字の出現回数（重複入力があってもマスクを正しく保つため）
+        size = self.size
+        self._row_counts = [bytearray(size + 1) for _ in range(size)]
+        self._col_counts = [bytearray(size + 1) for _ in range(size)]
+        self._box_counts = [bytearray(size + 1) for _ in range(size)]
+        self.row_masks = [0] * size
+        self.col_masks = [0] * size
+        self.box_masks = [0] * size
+        # 重複の数（各ユニットで 2 個目以降に置かれた同じ数字の個数の合計）
+        self.conflicts = 0
+        cells = self._cells
+        for i in range(size):
+            for j in range(size):
+                num = cells[i * size + j]
+                if num != 0:
+                    self._add_digit(i, j, num)
+    
+    def _add_digit(self, row: int, col: int, num: int) -> None:
+        bit = 1 << (num - 1)
+        box = self.box_index[row][col]
+        counts = self._row_counts[row]
+        counts[num] += 1
+        if counts[num] == 1:
+            self.row_masks[row] |= bit
+        else:
+            self.conflicts += 1
+        counts = self._col_counts[col]
+        counts[num] += 1
+        if counts[num] == 1:
+            self.col_masks[col] |= bit
+        else:
+            self.conflicts += 1
+        counts = self._box_counts[box]
+        counts[num] += 1
+        if counts[num] == 1:
+            self.box_masks[box] |= bit
+        else:
+            self.conflicts += 1
+    
+    def _remove_digit(self, row: int, col: int, num: int) -> None:
+        bit = 1 << (num - 1)
+        box = self.box_index[row][col]
+        counts = self._row_counts[row]
+        counts[num] -= 1
+        if counts[num] == 0:
+            self.row_masks[row] &= ~bit
+        else:
+            self.conflicts -= 1
+        counts = self._col_counts[col]
+        counts[num] -= 1
+        if counts[num] == 0:
+            self.col_masks[col] &= ~bit
+        else:
+            self.conflicts -= 1
+        counts = self._box_counts[box]
+        counts[num] -= 1
+        if counts[num] == 0:
+            self.box_masks[box] &= ~bit
+        else:
+            self.conflicts -= 1
     
     def validate_board_format(self, board: List[List[int]]) -> None:
-        if len(board) != 9:
+        """行数（SUPPORTED_SIZES のいずれか）・列数・数字の範囲を確認"""
+        size = len(board)
+        if size not in SUPPORTED_SIZES:
             raise ValueError(get_text("board.errors", "invalid_rows"))
         for row in board:
-            if len(row) != 9:
+            if len(row) != size:
                 raise ValueError(get_text("board.errors", "invalid_columns"))
             for cell in row:
-                if not isinstance(cell, int) or not (0 <= cell <= 9):
+                if not isinstance(cell, int) or not (0 <= cell <= size):
                     raise ValueError(get_text("board.errors", "invalid_cell"))
     
     def validate_full_board(self) -> bool:
-        """盤面全体が現在の状態で妥当（重複がない）かどうかをチェック"""
-        for i in range(9):
-            for j in range(9):
-                num = self.board[i][j]
-                if num != 0:
-                    self.board[i][j] = 0
-                    if not self.is_valid(i, j, num):
-                        self.board[i][j] = num  # 復元
-                        return False
-                    self.board[i][j] = num  # 復元
-        return True
+        """盤面全体が現在の状態で妥当（重複がない）かどうかをチェック（set_value で更新した重複の数を見るだけ）"""
+        return self.conflicts == 0
+    
+    def is_conflicting(self, row: int, col: int) -> bool:
+        """セルの数字が同じ行・列・ブロックの他のセルと重複しているかどうか"""
+        num = self._cells[row * self.size + col]
+        if num == 0 or self.conflicts == 0:
+            return False
+        return (self._row_counts[row][num] > 1 or self._col_counts[col][num] > 1
+                or self._box_counts[self.box_index[row][col]][num] > 1)
+    
+    def conflicting_cells(self) -> List[Tuple[int, int]]:
+        """他のセルと数字が重複しているセルの (row, col) のリストを返す（重複がなければ走査しない）"""
+        if self.conflicts == 0:
+            return []
+        size = self.size
+        return [(i, j) for i in range(size) for j in range(size) if self.is_conflicting(i, j)]
     
     @classmethod
     def from_file(cls, filepath: str) -> 'SudokuBoard':
@@ -42,35 +349,126 @@ class SudokuBoard:
         return cls(board_data)
     
     def is_valid(self, row: int, col: int, num: int) -> bool:
-        for x in range(9):
-            if self.board[row][x] == num or self.board[x][col] == num:
-                return False
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(3):
-            for j in range(3):
-                if self.board[start_row + i][start_col + j] == num:
-                    return False
-        return True
+        used = self.row_masks[row] | self.col_masks[col] | self.box_masks[self.box_index[row][col]]
+        return not (used >> (num - 1)) & 1
+    
+    def candidates_mask(self, row: int, col: int) -> int:
+        """セルに置ける数字のビットマスクを返す（セル自身の値は考慮しない）"""
+        used = self.row_masks[row] | self.col_masks[col] | self.box_masks[self.box_index[row][col]]
+        return ~used & self.all_digits
+    
+    def candidates(self, row: int, col: int) -> List[int]:
+        """セルに置ける数字のリストを返す"""
+        return mask_to_digits(self.candidates_mask(row, col))
     
     def find_empty(self) -> Optional[Tuple[int, int]]:
-        for i in range(9):
-            for j in range(9):
-                if self.board[i][j] == 0:
-                    return (i, j)
-        return None
+        idx = self._cells.find(0)
+        if idx < 0:
+            return None
+        return divmod(idx, self.size)
+    
+    def find_most_constrained(self) -> Optional[Tuple[int, int, int]]:
+        """候補数が最も少ない空きセルを探す（MRV: minimum remaining values）
+        
+        Returns:
+            (row, col, 候補マスク)。空きセルがなければ None。
+            候補が 0 個のセルが見つかった場合は即座にそのセルを返す（マスクは 0）
+        """
+        best = None
+        size = self.size
+        best_count = size + 1
+        cells = self._cells
+        row_masks, col_masks, box_masks = self.row_masks, self.col_masks, self.box_masks
+        box_index = self.box_index
+        all_digits, popcount = self.all_digits, self.popcount
+        # 空きセルだけを順に探す（埋まったセルは bytearray.find で読み飛ばす）
+        idx = cells.find(0)
+        while idx >= 0:
+            i, j = divmod(idx, size)
+            mask = ~(row_masks[i] | col_masks[j] | box_masks[box_index[i][j]]) & all_digits
+            count = popcount[mask]
+            if count < best_count:
+                if count <= 1:
+                    # 候補 0 個なら行き詰まり、1 個ならこれ以上良いセルはない
+                    return (i, j, mask)
+                best = (i, j, mask)
+                best_count = count
+            idx = cells.find(0, idx + 1)
+        return best
     
     def set_value(self, row: int, col: int, value: int) -> None:
-        self.board[row][col] = value
+        idx = row * self.size + col
+        old = self._cells[idx]
+        if old == value:
+            return
+        if self._trail is not None:
+            self._trail.append((idx, old))
+        if old != 0:
+            self._remove_digit(row, col, old)
+        self._cells[idx] = value
+        if value != 0:
+            self._add_digit(row, col, value)
+    
+    def checkpoint(self) -> int:
+        """変更の記録を開始し（記録中ならそのまま）、rollback() に渡す現在の位置を返す
+        
+        checkpoint() と release() は対にして呼ぶ（入れ子にできる）。
+        """
+        if self._trail is None:
+            self._trail = []
+        self._trail_depth += 1
+        return len(self._trail)
+    
+    def rollback(self, mark: int) -> None:
+        """checkpoint() が返した位置より後の変更を新しい順に取り消す"""
+        trail = self._trail
+        cells = self._cells
+        size = self.size
+        while len(trail) > mark:
+            idx, old = trail.pop()
+            row, col = divmod(idx, size)
+            value = cells[idx]
+            if value != 0:
+                self._remove_digit(row, col, value)
+            cells[idx] = old
+            if old != 0:
+                self._add_digit(row, col, old)
+    
+    def release(self) -> None:
+        """checkpoint() に対応する記録を終える（最も外側の release() で記録を捨てる。変更はそのまま残る）"""
+        self._trail_depth -= 1
+        if self._trail_depth == 0:
+            self._trail = None
     
     def get_value(self, row: int, col: int) -> int:
-        return self.board[row][col]
+        return self._cells[row * self.size + col]
     
     def is_original_cell(self, row: int, col: int) -> bool:
-        return self.original_board[row][col] != 0
+        return self._original[row * self.size + col] != 0
     
     def reset(self) -> None:
-        self.board = [row[:] for row in self.original_board]
+        self._load_cells(self._original)
     
     def copy(self) -> 'SudokuBoard':
-        """現在の盤面のコピーを作成"""
-        return SudokuBoard([row[:] for row in self.board])
+        """現在の盤面のコピーを作成（コピーの初期盤面は現在の盤面）
+        
+        セルの値と出現回数はバイト列のまま複製し、盤面を走査してマスクを作り直すことはしない。
+        """
+        board = SudokuBoard.__new__(SudokuBoard)
+        board.size = self.size
+        board.box_size = self.box_size
+        board.all_digits = self.all_digits
+        board.box_index = self.box_index
+        board.popcount = self.popcount
+        board._cells = self._cells[:]
+        board._original = bytes(self._cells)
+        board._row_counts = [counts[:] for counts in self._row_counts]
+        board._col_counts = [counts[:] for counts in self._col_counts]
+        board._box_counts = [counts[:] for counts in self._box_counts]
+        board.row_masks = self.row_masks[:]
+        board.col_masks = self.col_masks[:]
+        board.box_masks = self.box_masks[:]
+        board.conflicts = self.conflicts
+        board._trail = None
+        board._trail_depth = 0
+        return board
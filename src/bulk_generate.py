@@ -0,0 +1,83 @@
+"""
+問題の一括（並列）生成
+
+問題ごとに乱数の種を決め、プロセスプールのワーカーで 1 問ずつ生成する。
+種は呼び出し側の乱数から問題の番号順に決めるため、ワーカー同士が同じ問題を作ることはなく、
+生成の種（seed）を指定すればワーカー数によらず同じ番号に同じ問題ができる
+（1 問の生成はその問題の種だけで決まり、プロセスがそれまでに生成した問題には左右されない）。
+できた問題は終わった順に呼び出し側へ返し、書き出しは呼び出し側の 1 か所で行う。
+"""
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, NamedTuple, Optional
+from board import SudokuBoard
+from generator import SudokuGenerator, FILL_BACKTRACK, supported_difficulties
+from rater import DifficultyRating
+
+
+# ワーカー 1 つあたりに先行して投入しておく問題の数
+TASKS_PER_JOB = 2
+
+
+class GeneratedPuzzle(NamedTuple):
+    """生成した 1 問"""
+    index: int                          # 問題の番号（1 から）
+    difficulty: str                     # 難易度（"random" の場合は選ばれた難易度）
+    board: SudokuBoard                  # 生成した問題
+    rating: Optional[DifficultyRating]  # 難易度の判定結果
+
+
+def _generate_one(index: int, difficulty: str, size: int, fill_mode: str, seed: int,
+                  jobs: int = 1) -> GeneratedPuzzle:
+    """乱数の種を設定して 1 問生成する（ワーカープロセスでも呼び出し側でも使う）"""
+    random.seed(seed)
+    generator = SudokuGenerator(size=size, jobs=jobs, fill_mode=fill_mode)
+    board = generator.generate(difficulty)
+    return GeneratedPuzzle(index, difficulty, board, generator.rating)
+
+
+def iter_generated(count: int, difficulty: str, size: int = 9, fill_mode: str = FILL_BACKTRACK,
+                   jobs: int = 1, seed: Optional[int] = None) -> Iterator[GeneratedPuzzle]:
+    """問題を count 問生成し、できた順に返すジェネレーター
+    
+    jobs が 2 以上で複数の問題を作る場合は、問題ごとにワーカープロセスへ分ける
+    （1 問だけの場合は SudokuGenerator の jobs として渡し、16x16 以上の一意解チェックを並列にする）。
+    
+    Args:
+        count: 生成する問題数
+        difficulty: 難易度（"easy"・"medium"・"hard"・"random"）
+        size: 盤面の大きさ
+        fill_mode: 完成盤面の作り方（generator.FILL_MODES のいずれか）
+        jobs: ワーカープロセス数
+        seed: 生成の乱数の種（省略時は毎回異なる問題になる）
+    """
+    rng = random.Random(seed)
+    difficulties = supported_difficulties(size)
+    
+    def tasks():
+        # 難易度と種は番号順に決める（ワーカー数や終わる順序によらない）
+        for index in range(1, count + 1):
+            d = rng.choice(difficulties) if difficulty == "random" else difficulty
+            yield index, d, rng.getrandbits(64)
+    
+    if jobs <= 1 or count <= 1:
+        for index, d, task_seed in tasks():
+            yield _generate_one(index, d, size, fill_mode, task_seed, jobs)
+        return
+    
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    pending = set()
+    try:
+        for index, d, task_seed in tasks():
+            pending.add(executor.submit(_generate_one, index, d, size, fill_mode, task_seed))
+            if len(pending) >= jobs * TASKS_PER_JOB:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # 途中で止められた場合は未着手の問題を取り消す
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,158 @@
+"""
+数独の対称性による盤面の正規化
+
+数字の付け替え（relabel）、転置、バンド（3 行の組）の入れ替え、バンド内の行の入れ替え、
+スタック（3 列の組）の入れ替え、スタック内の列の入れ替えで互いに移り合う盤面は、
+解も同じ変換で移り合う。canonicalize() はこれらの変換で同じ盤面になるものを
+1 つの代表（正規形）に写し、その変換を Transform として返す。
+random_transform() は同じ種類の変換をランダムに選ぶ（完成盤面を変換して別の完成盤面を作るのに使う）。
+"""
+import random
+from itertools import chain, groupby, islice, permutations, product
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+
+# 行・列の並べ方の候補をこれより多く試さない（対称性の高い配置での計算量の上限）
+MAX_CANDIDATES = 512
+
+
+class Transform(NamedTuple):
+    """盤面を正規形に写す変換"""
+    transpose: bool            # 先に転置するかどうか
+    rows: Tuple[int, ...]      # 正規形の行 i は（転置後の）元の盤面の行 rows[i]
+    cols: Tuple[int, ...]      # 正規形の列 j は（転置後の）元の盤面の列 cols[j]
+    relabel: Tuple[int, ...]   # relabel[num] が正規形での数字（relabel[0] は 0）
+    
+    def apply(self, grid: List[List[int]]) -> List[List[int]]:
+        """元の盤面（または解）を正規形の側に写す"""
+        src = _transposed(grid) if self.transpose else grid
+        relabel = self.relabel
+        return [[relabel[src[row][col]] for col in self.cols] for row in self.rows]
+    
+    def invert(self, grid: List[List[int]]) -> List[List[int]]:
+        """正規形の側の盤面（または解）を元の盤面の側に戻す"""
+        inverse = [0] * 10
+        for num, label in enumerate(self.relabel):
+            inverse[label] = num
+        result = [[0] * 9 for _ in range(9)]
+        for i, row in enumerate(self.rows):
+            for j, col in enumerate(self.cols):
+                result[row][col] = inverse[grid[i][j]]
+        return _transposed(result) if self.transpose else result
+
+
+def _transposed(grid: List[List[int]]) -> List[List[int]]:
+    return [list(col) for col in zip(*grid)]
+
+
+def random_transform(size: int = 9) -> Transform:
+    """数独の解を解に写す変換をランダムに選ぶ（apply() は size x size の盤面に使える）
+    
+    数字の付け替え、バンド（スタック）の入れ替え、バンド（スタック）内の行（列）の入れ替え、
+    転置をそれぞれ一様に選ぶ。
+    """
+    box = int(round(size ** 0.5))
+    labels = list(range(1, size + 1))
+    random.shuffle(labels)
+    return Transform(random.random() < 0.5, _random_line_order(box), _random_line_order(box), (0, *labels))
+
+
+def _random_line_order(box: int) -> Tuple[int, ...]:
+    """バンド（スタック）の構造を保つ行（列）の並べ方をランダムに選ぶ"""
+    bands = list(range(box))
+    random.shuffle(bands)
+    order = []
+    for band in bands:
+        lines = list(range(band * box, (band + 1) * box))
+        random.shuffle(lines)
+        order.extend(lines)
+    return tuple(order)
+
+
+def _line_keys(grid: List[List[int]]) -> Tuple[List[tuple], List[tuple]]:
+    """行と列ごとの、行・列の並べ替えと数字の付け替えで変わらない特徴量を返す
+    
+    行の特徴量は (その行のヒント数, その行のヒントがある列のヒント数の昇順) で、列も同様。
+    """
+    row_counts = [sum(1 for num in row if num) for row in grid]
+    col_counts = [sum(1 for row in grid if row[col]) for col in range(9)]
+    row_keys = [
+        (row_counts[row], tuple(sorted(col_counts[col] for col in range(9) if grid[row][col])))
+        for row in range(9)
+    ]
+    col_keys = [
+        (col_counts[col], tuple(sorted(row_counts[row] for row in range(9) if grid[row][col])))
+        for col in range(9)
+    ]
+    return row_keys, col_keys
+
+
+def _tie_orders(items: Sequence[int], key) -> List[List[int]]:
+    """items を key の順に並べ、key が等しい要素どうしの並べ方をすべて返す"""
+    ordered = sorted(items, key=key)
+    groups = [list(group) for _, group in groupby(ordered, key=key)]
+    return [list(chain.from_iterable(choice)) for choice in product(*(permutations(g) for g in groups))]
+
+
+def _line_orders(keys: List[tuple]) -> Iterator[Tuple[int, ...]]:
+    """バンド（スタック）の構造を保つ行（列）の並べ方のうち、特徴量の順に並ぶものを返す"""
+    band_orders = _tie_orders(range(3), lambda band: sorted(keys[band * 3:band * 3 + 3]))
+    inner_orders = [_tie_orders(range(band * 3, band * 3 + 3), keys.__getitem__) for band in range(3)]
+    for band_order in band_orders:
+        for choice in product(*(inner_orders[band] for band in band_order)):
+            yield tuple(chain.from_iterable(choice))
+
+
+def _relabeled(grid: List[List[int]], rows: Sequence[int], cols: Sequence[int]) -> List[int]:
+    """行・列を並べ替えた盤面を、数字を左上から現れた順に 1, 2, ... と付け替えて 81 要素で返す"""
+    relabel = {0: 0}
+    cells = []
+    for row in rows:
+        line = grid[row]
+        for col in cols:
+            num = line[col]
+            label = relabel.get(num)
+            if label is None:
+                label = relabel[num] = len(relabel)
+            cells.append(label)
+    return cells
+
+
+def canonicalize(grid: List[List[int]]) -> Tuple[str, Transform]:
+    """盤面の正規形（81 文字）と、盤面を正規形に写す変換を返す
+    
+    行・列を特徴量の順に並べ、特徴量が等しくて順序が決まらない部分だけを総当たりして、
+    数字を付け替えた 81 文字が辞書順で最小になるものを正規形とする。
+    並べ方の候補が MAX_CANDIDATES を超える（対称性の高い）盤面では途中で打ち切るため、
+    同じ盤面に写らないことがある（その場合もキャッシュが当たらないだけで結果は正しい）。
+    """
+    orientations = []
+    for transpose in (False, True):
+        oriented = _transposed(grid) if transpose else grid
+        row_keys, col_keys = _line_keys(oriented)
+        orientations.append(((sorted(row_keys), sorted(col_keys)), transpose, oriented, row_keys, col_keys))
+    best_signature = min(entry[0] for entry in orientations)
+    
+    best = None
+    budget = MAX_CANDIDATES
+    for signature, transpose, oriented, row_keys, col_keys in orientations:
+        if signature != best_signature or budget <= 0:
+            continue
+        candidates = islice(product(_line_orders(row_keys), list(_line_orders(col_keys))), budget)
+        for rows, cols in candidates:
+            budget -= 1
+            cells = _relabeled(oriented, rows, cols)
+            if best is None or cells < best[0]:
+                best = (cells, transpose, oriented, rows, cols)
+    
+    cells, transpose, oriented, rows, cols = best
+    # 盤面に現れない数字にも、残りの番号を昇順に割り当てて置換を完成させる
+    relabel = [0] * 10
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            relabel[oriented[row][col]] = cells[i * 9 + j]
+    unused_labels = iter(sorted(set(range(1, 10)) - set(relabel)))
+    for num in range(1, 10):
+        if relabel[num] == 0:
+            relabel[num] = next(unused_labels)
+    return ''.join(map(str, cells)), Transform(transpose, tuple(rows), tuple(cols), tuple(relabel))
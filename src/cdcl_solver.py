@@ -0,0 +1,425 @@
+"""
+節学習（CDCL: conflict-driven clause learning）による数独ソルバー
+
+数独を「セル×数字」の真偽変数の充足可能性問題として解く。
+各セルと各ユニット×数字の「少なくとも 1 つ」は節として 2 リテラル監視で伝播し、
+「高々 1 つ」は変数が真になったときに同じグループの他の変数を偽にする形で直接伝播する。
+矛盾が起きたら原因を解析して学習節（nogood）を追加し、原因に関係する決定レベルまで
+一気に戻る（非時系列バックジャンプ）。一定の矛盾数ごとにリスタートするため、
+序盤の誤った決定に探索が閉じ込められることがない。
+
+リテラルは変数番号（1 始まり）の正負で表し、+v が「変数 v が真」、-v が「偽」を表す。
+"""
+import heapq
+from typing import List, Optional
+from board import SudokuBoard, mask_to_digits
+from propagation import get_geometry
+from solve_limits import LimitChecker, SolveLimits, SolveResult, SolveStatus
+from solve_stats import SolveStats
+
+
+# リスタート間隔の単位（Luby 数列の値 × この矛盾数ごとにリスタートする）
+RESTART_UNIT = 64
+
+# 矛盾ごとに変数の活動度の増分に掛ける倍率（VSIDS。大きいほど過去の矛盾を長く覚える）
+ACTIVITY_DECAY = 0.95
+
+# 学習節がこの数を超えたら、理由になっていない長い学習節の古い半分を捨てる（捨てるたびに 1.1 倍）
+MAX_LEARNTS = 2000
+
+
+def _luby(i: int) -> int:
+    """Luby 数列の i 番目（1 始まり）: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class CDCLSolver:
+    """節学習・バックジャンプ・リスタートを行う探索で数独を解くクラス
+    
+    DLXSolver と同じく solve() で盤面を解答で埋め、count_solutions() で解の個数を数える。
+    大きい盤面や、時系列のバックトラッキングが行き詰まる難問向け。
+    """
+    
+    def __init__(self, board: SudokuBoard):
+        self.board = board
+    
+    def solve(self) -> bool:
+        """数独を解き、解けた場合は盤面を解答で埋める
+        
+        Returns:
+            bool: 解けたかどうか
+        """
+        return self.solve_with_limits().solved
+    
+    def solve_with_limits(self, limits: Optional[SolveLimits] = None, stats: Optional[SolveStats] = None) -> SolveResult:
+        """時間・ノード数（決定の回数）の上限と中断トークンを確認しながら数独を解く
+        
+        上限に達した場合や解がない場合、盤面は変更しない。
+        stats を指定すると、決定の回数をノード数、矛盾の回数をバックトラック回数として加算する。
+        
+        Returns:
+            SolveResult: 結果の種類と探索したノード数
+        """
+        checker = LimitChecker(limits)
+        search = _Search(self.board, checker, stats)
+        count = search.run(1)
+        if checker.status is not None:
+            status = checker.status
+        elif count == 0:
+            status = SolveStatus.UNSOLVABLE
+        else:
+            status = SolveStatus.SOLVED
+            size = self.board.size
+            for idx, num in search.solution:
+                self.board.set_value(idx // size, idx % size, num)
+        
+        result = checker.result(status)
+        if stats is not None:
+            stats.finish_solve(result.nodes, result.elapsed, 0.0)
+        return result
+    
+    def count_solutions(self, max_solutions: int = 2, solution: Optional[List[List[int]]] = None,
+                        limits: Optional[SolveLimits] = None) -> Optional[int]:
+        """解の個数を max_solutions を上限として数える（盤面は変更しない）
+        
+        解が見つかるたびに、その解を除く節を加えて探索を続ける。
+        
+        Args:
+            max_solutions: 数える解の上限
+            solution: リストを渡すと、最初に見つかった解（盤面と同じ大きさの 2 次元リスト）が格納される
+            limits: 探索の上限（上限に達した場合は None を返す）
+        """
+        checker = LimitChecker(limits)
+        search = _Search(self.board, checker, None)
+        count = search.run(max_solutions)
+        if checker.status is not None:
+            return None
+        if count and solution is not None:
+            size = self.board.size
+            grid = self.board.to_list()
+            for idx, num in search.solution:
+                grid[idx // size][idx % size] = num
+            solution[:] = grid
+        return count
+
+
+class _Search:
+    """1 回の探索の状態（変数・節・割り当ての履歴）"""
+    
+    def __init__(self, board: SudokuBoard, checker: LimitChecker, stats: Optional[SolveStats]):
+        self.checker = checker
+        self.stats = stats
+        # 最初に見つかった解の (セル番号, 数字) のリスト
+        self.solution: List[tuple] = []
+        
+        # 空きセルの候補ごとに変数を作る（変数 0 は使わない）
+        size = board.size
+        self.var_cell = [0]
+        self.var_digit = [0]
+        var_of = {}
+        groups = []
+        self.ok = board.validate_full_board()
+        if self.ok:
+            for idx in range(size * size):
+                row, col = divmod(idx, size)
+                if board.get_value(row, col) != 0:
+                    continue
+                group = []
+                for num in mask_to_digits(board.candidates_mask(row, col)):
+                    var_of[idx, num] = len(self.var_cell)
+                    group.append(len(self.var_cell))
+                    self.var_cell.append(idx)
+                    self.var_digit.append(num)
+                groups.append(group)
+            # ユニットごとに、まだ置かれていない数字を置けるセルの変数
+            for unit in get_geometry(size).units:
+                placed = {board.get_value(idx // size, idx % size) for idx in unit}
+                for num in range(1, size + 1):
+                    if num not in placed:
+                        groups.append([var_of[idx, num] for idx in unit if (idx, num) in var_of])
+        
+        n = len(self.var_cell) - 1
+        self.num_vars = n
+        self.assign = [0] * (n + 1)       # 1: 真、-1: 偽、0: 未割り当て
+        self.level = [0] * (n + 1)        # 割り当てた決定レベル
+        self.reason = [None] * (n + 1)    # 割り当ての理由の節（先頭が割り当てたリテラル。決定なら None）
+        self.seen = [False] * (n + 1)     # 矛盾の解析用
+        self.activity = [0.0] * (n + 1)
+        self.activity_inc = 1.0
+        self.heap = [(0.0, v) for v in range(1, n + 1)]  # (-活動度, 変数) の未割り当て変数の候補
+        self.trail: List[int] = []        # 割り当てたリテラルの順序
+        self.trail_lim: List[int] = []    # 各決定レベルが始まる trail の位置
+        self.qhead = 0                    # 伝播済みの trail の位置
+        self.watches = {}                 # リテラル -> そのリテラルを監視している節のリスト
+        self.learnts: List[List[int]] = []
+        self.max_learnts = MAX_LEARNTS
+        
+        # 高々 1 つの制約は、変数が属するグループ（セル 1 つとユニット×数字 3 つ）で伝播する
+        self.var_groups = [[] for _ in range(n + 1)]
+        self.units = []
+        for group in groups:
+            for v in group:
+                self.var_groups[v].append(group)
+            if not group:
+                self.ok = False
+            elif len(group) == 1:
+                self.units.append(group[:])
+            else:
+                self._watch(list(group))
+    
+    def run(self, max_solutions: int) -> int:
+        """解を max_solutions 個まで探し、見つかった解の個数を返す（上限に達したら途中で打ち切る）"""
+        if not self.ok:
+            return 0
+        for clause in self.units:
+            if not self._enqueue(clause[0], clause):
+                return 0
+        
+        found = 0
+        conflicts = 0
+        restarts = 1
+        restart_limit = _luby(restarts) * RESTART_UNIT
+        stats = self.stats
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                if stats is not None:
+                    stats.backtracks += 1
+                if not self.trail_lim:
+                    # 決定なしで矛盾した＝（残りの）解がない
+                    return found
+                learnt, back_level = self._analyze(conflict)
+                self._backtrack(back_level)
+                if len(learnt) > 1:
+                    self._watch(learnt)
+                    self.learnts.append(learnt)
+                self._enqueue(learnt[0], learnt)
+                self.activity_inc /= ACTIVITY_DECAY
+                conflicts += 1
+                if len(self.learnts) > self.max_learnts:
+                    self._reduce_learnts()
+                continue
+            
+            if conflicts >= restart_limit:
+                # リスタート（学習節と活動度は残す）
+                self._backtrack(0)
+                conflicts = 0
+                restarts += 1
+                restart_limit = _luby(restarts) * RESTART_UNIT
+                continue
+            
+            var = self._pick_var()
+            if var is None:
+                # すべての変数が矛盾なく割り当てられた＝解
+                found += 1
+                if found == 1:
+                    self.solution = [(self.var_cell[v], self.var_digit[v])
+                                     for v in range(1, self.num_vars + 1) if self.assign[v] == 1]
+                if found >= max_solutions or not self.trail_lim:
+                    return found
+                # この解の決定をすべて繰り返すことを禁じる節を加えて探索を続ける
+                blocking = [-self.trail[start] for start in self.trail_lim]
+                self._backtrack(0)
+                if len(blocking) > 1:
+                    self._watch(blocking)
+                elif not self._enqueue(blocking[0], blocking):
+                    return found
+                continue
+            
+            if self.checker.tick() is not None:
+                return found
+            self.trail_lim.append(len(self.trail))
+            if stats is not None and len(self.trail_lim) > stats.max_depth:
+                stats.max_depth = len(self.trail_lim)
+            self._enqueue(var, None)
+    
+    def _watch(self, clause: List[int]) -> None:
+        """節の先頭 2 リテラルを監視する"""
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+    
+    def _enqueue(self, lit: int, reason: Optional[List[int]]) -> bool:
+        """リテラルを真にする（すでに偽なら False）"""
+        var = lit if lit > 0 else -lit
+        value = self.assign[var]
+        if value != 0:
+            return (value > 0) == (lit > 0)
+        self.assign[var] = 1 if lit > 0 else -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+        return True
+    
+    def _propagate(self) -> Optional[List[int]]:
+        """単位伝播を行い、矛盾した節を返す（矛盾がなければ None）"""
+        assign = self.assign
+        trail = self.trail
+        watches = self.watches
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            if p > 0:
+                # 高々 1 つ: 同じグループの他の変数はすべて偽
+                for group in self.var_groups[p]:
+                    for other in group:
+                        if other != p:
+                            value = assign[other]
+                            if value > 0:
+                                return [-other, -p]
+                            if value == 0:
+                                self._enqueue(-other, [-other, -p])
+            
+            # 偽になったリテラル -p を監視している節を調べる
+            false_lit = -p
+            watchers = watches.get(false_lit)
+            if not watchers:
+                continue
+            kept = []
+            k = 0
+            count = len(watchers)
+            while k < count:
+                clause = watchers[k]
+                k += 1
+                if not clause:
+                    # 捨てた学習節
+                    continue
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                first_value = assign[first] if first > 0 else -assign[-first]
+                if first_value > 0:
+                    kept.append(clause)
+                    continue
+                # 偽でない別のリテラルを監視し直す
+                for m in range(2, len(clause)):
+                    lit = clause[m]
+                    if (assign[lit] if lit > 0 else -assign[-lit]) >= 0:
+                        clause[1], clause[m] = lit, false_lit
+                        watches.setdefault(lit, []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if first_value < 0:
+                        kept.extend(watchers[k:])
+                        watches[false_lit] = kept
+                        return clause
+                    self._enqueue(first, clause)
+            watches[false_lit] = kept
+        return None
+    
+    def _analyze(self, conflict: List[int]):
+        """矛盾の原因を最初の UIP まで解析し、(学習節, 戻る決定レベル) を返す
+        
+        学習節の先頭は戻った後に真になるリテラル、2 番目は戻る決定レベルで偽のリテラル。
+        """
+        level = self.level
+        seen = self.seen
+        trail = self.trail
+        current = len(self.trail_lim)
+        learnt = [0]
+        to_clear = []
+        counter = 0
+        p = 0
+        clause = conflict
+        index = len(trail) - 1
+        while True:
+            for q in clause:
+                if q == p:
+                    continue
+                var = q if q > 0 else -q
+                if not seen[var] and level[var] > 0:
+                    seen[var] = True
+                    to_clear.append(var)
+                    self._bump(var)
+                    if level[var] >= current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            # 現在のレベルで最も新しく割り当てた、解析中の変数
+            while not seen[abs(trail[index])]:
+                index -= 1
+            p = trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[abs(p)]
+        learnt[0] = -p
+        for var in to_clear:
+            seen[var] = False
+        
+        if len(learnt) == 1:
+            return learnt, 0
+        deepest = max(range(1, len(learnt)), key=lambda i: level[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, level[abs(learnt[1])]
+    
+    def _backtrack(self, target_level: int) -> None:
+        """決定レベル target_level まで割り当てを取り消す"""
+        if len(self.trail_lim) <= target_level:
+            return
+        start = self.trail_lim[target_level]
+        assign, reason, activity, heap = self.assign, self.reason, self.activity, self.heap
+        for lit in self.trail[start:]:
+            var = lit if lit > 0 else -lit
+            assign[var] = 0
+            reason[var] = None
+            heapq.heappush(heap, (-activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[target_level:]
+        self.qhead = len(self.trail)
+    
+    def _bump(self, var: int) -> None:
+        """矛盾に関わった変数の活動度を上げる"""
+        activity = self.activity
+        activity[var] += self.activity_inc
+        if activity[var] > 1e100:
+            # 桁あふれを防ぐため全体を縮める
+            for v in range(1, self.num_vars + 1):
+                activity[v] *= 1e-100
+            self.activity_inc *= 1e-100
+            self._rebuild_heap()
+        elif self.assign[var] == 0:
+            heapq.heappush(self.heap, (-activity[var], var))
+    
+    def _rebuild_heap(self) -> None:
+        self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1) if self.assign[v] == 0]
+        heapq.heapify(self.heap)
+    
+    def _pick_var(self) -> Optional[int]:
+        """活動度が最も高い未割り当ての変数を返す（すべて割り当て済みなら None）"""
+        heap = self.heap
+        if len(heap) > 4 * self.num_vars + 64:
+            self._rebuild_heap()
+            heap = self.heap
+        assign, activity = self.assign, self.activity
+        while heap:
+            neg_activity, var = heapq.heappop(heap)
+            if assign[var] == 0 and -neg_activity == activity[var]:
+                return var
+        return None
+    
+    def _reduce_learnts(self) -> None:
+        """理由になっていない長い学習節のうち、古い半分を捨てる"""
+        reason, assign = self.reason, self.assign
+        half = len(self.learnts) // 2
+        kept = []
+        for i, clause in enumerate(self.learnts):
+            first = clause[0]
+            var = first if first > 0 else -first
+            locked = assign[var] != 0 and reason[var] is clause
+            if i < half and len(clause) > 2 and not locked:
+                # 監視リストからは伝播時に取り除かれる
+                clause.clear()
+            else:
+                kept.append(clause)
+        self.learnts = kept
+        self.max_learnts = int(self.max_learnts * 1.1)
@@ -1,29 +1,38 @@
 import os
 import time
-import random
 import argparse
+import multiprocessing
 from datetime import datetime
-from board import SudokuBoard
-from solver import SudokuSolver
-from generator import SudokuGenerator
+from board import SudokuBoard, SUPPORTED_SIZES
+from solver_registry import AUTO, create_solver, get_solver_names, supports_animation
+from solve_stats import SolveStats
+from solve_trace import TraceWriter
+from generator import FILL_BACKTRACK, FILL_MODES
+from bulk_generate import iter_generated
+from puzzle_bank import PuzzleBank, DIFFICULTIES
+from parallel_search import ParallelSearch
 from file_io import save_board_to_file, load_board_from_file
 from lang_manager import get_text, get_language_manager
 
 
 def print_board(board: SudokuBoard):
-    print("-" * 25)
+    box = board.box_size
+    width = len(str(board.size))
+    line_width = box * (box * (width + 1) + 2) + 1
+    print("-" * line_width)
     for i, row in enumerate(board.board):
         print("| ", end="")
         for j, cell in enumerate(row):
-            print(cell if cell != 0 else ".", end=" ")
-            if (j + 1) % 3 == 0:
+            print(str(cell if cell != 0 else ".").rjust(width), end=" ")
+            if (j + 1) % box == 0:
                 print("| ", end="")
         print()
-        if (i + 1) % 3 == 0:
-            print("-" * 25)
+        if (i + 1) % box == 0:
+            print("-" * line_width)
 
 
-def run_console(input_file: str, verbose: bool = False, language: str = None):
+def run_console(input_file: str, verbose: bool = False, language: str = None, solver_name: str = AUTO,
+                trace_file: str = None, jobs: int = 1, split_depth: int = None):
     # 言語設定を初期化（引数で指定された場合のみ）
     if language:
         get_language_manager(language)
@@ -32,7 +41,12 @@ def run_console(input_file: str, verbose: bool = False, language: str = None):
         print(get_text("console.messages", "loading_puzzle"))
         board_data = load_board_from_file(input_file)  # 直接file_io.pyを使用
         board = SudokuBoard(board_data)
-        solver = SudokuSolver(board)
+        if trace_file:
+            # トレースの記録にはステップを返すソルバーが必要（並列探索は行わない）
+            jobs = 1
+            if not supports_animation(solver_name):
+                solver_name = "backtrack"
+        solver = create_solver(board, solver_name) if jobs <= 1 else None
         
         print(get_text("console.messages", "puzzle_loaded"))
         print("\n" + get_text("console.messages", "original_puzzle") + ":")
@@ -40,44 +54,90 @@ def run_console(input_file: str, verbose: bool = False, language: str = None):
         
         print(get_text("console.messages", "solving_puzzle"))
         start_time = time.time()
-        if solver.solve(animate=False):  # コールバックなしでsolveを呼び出す
-            end_time = time.time()
+        stats = SolveStats() if verbose else None
+        if trace_file:
+            with TraceWriter(trace_file, board.board) as trace:
+                result = solver.solve_with_limits(stats=stats, trace=trace)
+            print(get_text("console.messages", "trace_saved", None, trace_file, trace.steps))
+        elif solver is None:
+            # 探索木を分割してワーカープロセスで並列に解く
+            with ParallelSearch(jobs, solver_name, split_depth) as search:
+                result = search.solve(board, stats=stats)
+        else:
+            result = solver.solve_with_limits(stats=stats)  # コールバックなしで解く
+        end_time = time.time()
+        if result.solved:
             print("\n" + get_text("console.messages", "solution"))
             print_board(board)
-            if verbose:
-                elapsed_time = end_time - start_time
-                print(get_text("console.messages", "solving_time", elapsed_time))
         else:
             print(get_text("console.messages", "no_solution"))
+        if verbose:
+            elapsed_time = end_time - start_time
+            print(get_text("console.messages", "solving_time", None, elapsed_time))
+            for line in stats.summary_lines():
+                print(line)
     except Exception as e:
         print(f"{get_text('console.messages', 'error')}: {e}")
 
 
-def generate_problems(count: int, difficulty: str, output_dir: str, language: str = None):
+def generate_problems(count: int, difficulty: str, output_dir: str, language: str = None, size: int = 9,
+                      jobs: int = 1, fill_mode: str = FILL_BACKTRACK, seed: int = None, use_bank: bool = False):
     # 言語設定を初期化（引数で指定された場合のみ）
     if language:
         get_language_manager(language)
         
     os.makedirs(output_dir, exist_ok=True)
     now = datetime.now().strftime("%Y%m%d_%H%M%S")
-    difficulties = ["easy", "medium", "hard"]
     
     print(get_text("console.messages", "generating_puzzle"))
     
-    for i in range(1, count + 1):
-        d = random.choice(difficulties) if difficulty == "random" else difficulty
-        generator = SudokuGenerator()
-        problem = generator.generate(d)
-        board = SudokuBoard(problem)
-        
-        filename = f"{d}_{now}_{i}.txt"
+    def save(index: int, d: str, board: SudokuBoard):
+        filename = f"{d}_{now}_{index}.txt"
         filepath = os.path.join(output_dir, filename)
-        save_board_to_file(board.board, filepath)
+        save_board_to_file(board.to_list(), filepath)
         
-        print(get_text("console.messages", "puzzle_saved", filepath))
+        print(get_text("console.messages", "puzzle_saved", None, filepath))
+    
+    # 問題バンク（9x9 のみ）を使う場合は在庫の問題を先に書き出し、足りない分だけ生成する
+    taken = 0
+    if use_bank and size == 9:
+        bank = PuzzleBank(fill_mode=fill_mode)
+        while taken < count:
+            d = bank.resolve_difficulty(difficulty)
+            board = bank.take(d)
+            if board is None:
+                break
+            taken += 1
+            save(taken, d, board)
+    
+    # 問題はワーカーで生成し、ファイルへの書き出しはできた順にここでまとめて行う
+    try:
+        for puzzle in iter_generated(count - taken, difficulty, size, fill_mode, jobs, seed):
+            save(taken + puzzle.index, puzzle.difficulty, puzzle.board)
+    except ValueError as e:
+        # 難易度の範囲に入る問題を作れなかった（範囲外の問題は書き出さない）
+        print(f"{get_text('console.messages', 'error')}: {e}")
+
+
+def fill_puzzle_bank(jobs: int = 1, fill_mode: str = FILL_BACKTRACK, language: str = None):
+    """問題バンクのすべての難易度の在庫を上限まで補充する"""
+    if language:
+        get_language_manager(language)
+    
+    print(get_text("console.messages", "generating_puzzle"))
+    bank = PuzzleBank(fill_mode=fill_mode)
+    try:
+        added = bank.fill(jobs)
+    except ValueError as e:
+        print(f"{get_text('console.messages', 'error')}: {e}")
+        return
+    stock = ", ".join(f"{d}={bank.count(d)}" for d in DIFFICULTIES)
+    print(get_text("console.messages", "bank_filled", None, added, stock))
 
 
 if __name__ == "__main__":
+    # 実行ファイル（PyInstaller）から起動したワーカープロセスでは、引数を解釈せずにワーカーとして動かす
+    multiprocessing.freeze_support()
     parser = argparse.ArgumentParser(description='数独パズルを解くプログラム')
     parser.add_argument('file', nargs='?', help='数独パズルのファイルパス')
     parser.add_argument('-v', '--verbose', action='store_true', help='詳細出力モード')
@@ -86,14 +146,44 @@ if __name__ == "__main__":
                         help='生成時の難易度（default: medium、random指定可）')
     parser.add_argument('--output_dir', type=str, default='generated',
                         help='出力先フォルダ（default: ./generated）')
+    parser.add_argument('--size', type=int, choices=SUPPORTED_SIZES, default=9,
+                        help='生成する盤面の大きさ（default: 9、16 なら 16x16）')
+    parser.add_argument('--fill', choices=FILL_MODES, default=FILL_BACKTRACK,
+                        help='生成時の完成盤面の作り方（default: backtrack、transform は種の盤面の変換で高速に作る）')
+    parser.add_argument('--seed', type=int, help='生成の乱数の種（同じ種なら --jobs によらず同じ問題を生成する）')
+    parser.add_argument('--bank', action='store_true',
+                        help='--generate で問題バンクにある 9x9 の問題を先に使い、足りない分だけ生成する')
+    parser.add_argument('--fill_bank', action='store_true', help='問題バンクの在庫をすべての難易度で上限まで補充する')
     parser.add_argument('--language', type=str, choices=['ja', 'en'], help='言語設定（ja: 日本語, en: 英語）')
+    parser.add_argument('--solver', choices=[AUTO] + get_solver_names(), default=AUTO,
+                        help='使用するソルバー（default: auto、盤面に応じて自動選択）')
+    parser.add_argument('--trace', type=str, help='解答の過程をトレースファイルに記録する')
+    parser.add_argument('--batch', type=str, help='1 行 1 問形式の問題集ファイルをまとめて解く')
+    parser.add_argument('--jobs', type=int,
+                        help='ワーカープロセス数（--batch の default: CPU 数。--generate で 2 問以上を作る場合は'
+                             '問題ごとに分けて並列に生成する。1 問の解答と 16x16 以上の 1 問の生成では、'
+                             '2 以上を指定すると探索木を分割して並列に探索する）')
+    parser.add_argument('--split_depth', type=int, help='1 問を並列に解くときに探索木を分割する深さ（default: 自動）')
+    parser.add_argument('--chunk_size', type=int, default=256, help='--batch で 1 回の作業単位とする問題数（default: 256）')
+    parser.add_argument('--output', type=str, help='--batch の解答の出力先ファイル（default: 標準出力）')
+    parser.add_argument('--cache_size', type=int, default=4096,
+                        help='--batch でワーカーごとに保持する解答キャッシュの大きさ（default: 4096、0 で無効）')
+    parser.add_argument('--timeout', type=float, help='--batch で 1 問あたりの制限時間（秒）')
+    parser.add_argument('--max_nodes', type=int, help='--batch で 1 問あたりの探索ノード数の上限')
     args = parser.parse_args()
     
     # 言語設定を初期化
     language = args.language or "ja"
     get_language_manager(language)
     
-    if args.generate:
-        generate_problems(args.generate, args.difficulty, args.output_dir, language)
+    if args.batch:
+        from batch import run_batch
+        run_batch(args.batch, args.output, args.jobs, args.chunk_size, args.solver, language, args.cache_size,
+                  args.timeout, args.max_nodes, args.verbose)
+    elif args.fill_bank:
+        fill_puzzle_bank(args.jobs or 1, args.fill, language)
+    elif args.generate:
+        generate_problems(args.generate, args.difficulty, args.output_dir, language, args.size, args.jobs or 1,
+                          args.fill, args.seed, args.bank)
     elif args.file:
-        run_console(args.file, args.verbose, language)
+        run_console(args.file, args.verbose, language, args.solver, args.trace, args.jobs or 1, args.split_depth)
@@ -0,0 +1,268 @@
+from typing import List, Optional
+from board import SudokuBoard, box_size_of
+from solve_limits import LimitChecker, SolveLimits, SolveResult, SolveStatus
+from solve_stats import SolveStats
+
+
+def _candidate_columns(row: int, col: int, num: int, size: int = 9) -> List[int]:
+    """候補 (row, col, num) が満たす 4 つの制約の列番号（1 始まり）を返す"""
+    box_size = box_size_of(size)
+    box = (row // box_size) * box_size + col // box_size
+    cells = size * size
+    d = num - 1
+    return [
+        1 + row * size + col,
+        1 + cells + row * size + d,
+        1 + cells * 2 + col * size + d,
+        1 + cells * 3 + box * size + d,
+    ]
+
+
+def _build_template(size: int = 9):
+    """空盤面の exact cover 行列を Dancing Links のリンク配列として構築する
+    
+    制約（列）は セル・行×数字・列×数字・ブロック×数字 の 4 * size * size 個（9x9 では 324 個）、
+    候補（行）は size ** 3 個（9x9 では 729 個）。
+    ノード 0 がルート、1〜制約数が列ヘッダー、それ以降が各候補の 4 ノード。
+    """
+    num_constraints = size * size * 4
+    num_candidates = size ** 3
+    num_nodes = 1 + num_constraints + num_candidates * 4
+    left = [0] * num_nodes
+    right = [0] * num_nodes
+    up = [0] * num_nodes
+    down = [0] * num_nodes
+    column = [0] * num_nodes
+    row_id = [-1] * num_nodes
+    sizes = [0] * (1 + num_constraints)
+    
+    # ルートと列ヘッダーを横方向に環状リンク
+    for i in range(num_constraints + 1):
+        left[i] = i - 1 if i > 0 else num_constraints
+        right[i] = i + 1 if i < num_constraints else 0
+        up[i] = down[i] = column[i] = i
+    
+    node = num_constraints + 1
+    for row in range(size):
+        for col in range(size):
+            for num in range(1, size + 1):
+                cand = (row * size + col) * size + (num - 1)
+                first = node
+                for c in _candidate_columns(row, col, num, size):
+                    # 列 c の末尾に追加
+                    column[node] = c
+                    row_id[node] = cand
+                    up[node] = up[c]
+                    down[node] = c
+                    down[up[c]] = node
+                    up[c] = node
+                    sizes[c] += 1
+                    # 同じ候補の 4 ノードを横方向に環状リンク
+                    left[node] = node - 1 if node > first else first + 3
+                    right[node] = node + 1 if node < first + 3 else first
+                    node += 1
+    
+    # 候補番号から最初のノードへの対応表
+    first_node = [num_constraints + 1 + cand * 4 for cand in range(num_candidates)]
+    return left, right, up, down, column, row_id, sizes, first_node
+
+
+# 盤面の大きさごとのリンク配列のテンプレート
+_TEMPLATES = {}
+
+
+def _get_template(size: int = 9):
+    template = _TEMPLATES.get(size)
+    if template is None:
+        template = _TEMPLATES[size] = _build_template(size)
+    return template
+
+
+class DLXSolver:
+    """数独を exact cover 問題として Dancing Links（Algorithm X）で解くクラス
+    
+    SudokuSolver と同じく solve() で盤面を解答で埋め、count_solutions() で解の個数を数える。
+    """
+    
+    def __init__(self, board: SudokuBoard):
+        self.board = board
+    
+    def solve(self) -> bool:
+        """数独を解き、解けた場合は盤面を解答で埋める
+        
+        Returns:
+            bool: 解けたかどうか
+        """
+        return self.solve_with_limits().solved
+    
+    def solve_with_limits(self, limits: Optional[SolveLimits] = None, stats: Optional[SolveStats] = None) -> SolveResult:
+        """時間・ノード数の上限と中断トークンを確認しながら数独を解く
+        
+        上限に達した場合や解がない場合、盤面は変更しない。
+        stats を指定すると探索の統計を加算する（制約伝播は行わないため、時間はすべて探索に数える）。
+        
+        Returns:
+            SolveResult: 結果の種類と探索したノード数
+        """
+        checker = LimitChecker(limits)
+        solution = []
+        count = self._search_solutions(1, solution, checker, stats)
+        if checker.status is not None:
+            status = checker.status
+        elif count == 0:
+            status = SolveStatus.UNSOLVABLE
+        else:
+            status = SolveStatus.SOLVED
+            size = self.board.size
+            for cand in solution:
+                cell, d = divmod(cand, size)
+                self.board.set_value(cell // size, cell % size, d + 1)
+        
+        result = checker.result(status)
+        if stats is not None:
+            stats.finish_solve(result.nodes, result.elapsed, 0.0)
+        return result
+    
+    def count_solutions(self, max_solutions: int = 2, solution: Optional[List[List[int]]] = None,
+                        limits: Optional[SolveLimits] = None) -> Optional[int]:
+        """解の個数を max_solutions を上限として数える（盤面は変更しない）
+        
+        Args:
+            max_solutions: 数える解の上限
+            solution: リストを渡すと、最初に見つかった解（盤面と同じ大きさの 2 次元リスト）が格納される
+            limits: 探索の上限（上限に達した場合は None を返す）
+        """
+        checker = LimitChecker(limits) if limits is not None else None
+        found = [] if solution is not None else None
+        count = self._search_solutions(max_solutions, found, checker)
+        if checker is not None and checker.status is not None:
+            return None
+        if count and solution is not None:
+            size = self.board.size
+            grid = [[0] * size for _ in range(size)]
+            for cand in found:
+                cell, d = divmod(cand, size)
+                grid[cell // size][cell % size] = d + 1
+            solution[:] = grid
+        return count
+    
+    def _search_solutions(self, max_solutions: int, solution: Optional[List[int]],
+                          checker: Optional[LimitChecker] = None, stats: Optional[SolveStats] = None) -> int:
+        """Algorithm X で探索し、見つかった解の個数を返す
+        
+        solution にリストを渡すと、最初に見つかった解の候補番号が格納される。
+        checker を渡すと各ノードで上限を確認し、上限に達したら探索を打ち切る（checker.status に理由が入る）。
+        stats を渡すとバックトラック回数と最大深さを加算する。
+        """
+        size = self.board.size
+        left, right, up, down, column, row_id, sizes, first_node = _get_template(size)
+        # テンプレートを複製して、この探索専用のリンク配列を作る
+        L, R, U, D = left[:], right[:], up[:], down[:]
+        C = column
+        S = sizes[:]
+        
+        def cover(c):
+            R[L[c]] = R[c]
+            L[R[c]] = L[c]
+            i = D[c]
+            while i != c:
+                j = R[i]
+                while j != i:
+                    D[U[j]] = D[j]
+                    U[D[j]] = U[j]
+                    S[C[j]] -= 1
+                    j = R[j]
+                i = D[i]
+        
+        def uncover(c):
+            i = U[c]
+            while i != c:
+                j = L[i]
+                while j != i:
+                    S[C[j]] += 1
+                    D[U[j]] = j
+                    U[D[j]] = j
+                    j = L[j]
+                i = U[i]
+            R[L[c]] = c
+            L[R[c]] = c
+        
+        # 初期配置の数字を選択済みとして被覆する
+        covered = [False] * len(sizes)
+        givens = []
+        for row in range(size):
+            for col in range(size):
+                num = self.board.get_value(row, col)
+                if num == 0:
+                    continue
+                cand = (row * size + col) * size + (num - 1)
+                node = first_node[cand]
+                for k in range(4):
+                    if covered[C[node + k]]:
+                        # 同じ制約を二重に満たす＝重複があるため解なし
+                        return 0
+                    covered[C[node + k]] = True
+                givens.append(cand)
+                j = node
+                while True:
+                    cover(C[j])
+                    j = R[j]
+                    if j == node:
+                        break
+        
+        partial = []
+        found = [0]
+        
+        def search() -> bool:
+            """解が上限に達したら True を返して探索を打ち切る"""
+            if checker is not None and checker.tick() is not None:
+                return True
+            if stats is not None and len(partial) > stats.max_depth:
+                stats.max_depth = len(partial)
+            if R[0] == 0:
+                if found[0] == 0 and solution is not None:
+                    solution.extend(givens)
+                    solution.extend(row_id[node] for node in partial)
+                found[0] += 1
+                return found[0] >= max_solutions
+            
+            # 残りの行数が最も少ない列を選ぶ
+            best = R[0]
+            best_size = S[best]
+            c = R[best]
+            while c != 0:
+                if S[c] < best_size:
+                    best, best_size = c, S[c]
+                    if best_size <= 1:
+                        break
+                c = R[c]
+            if best_size == 0:
+                if stats is not None:
+                    stats.backtracks += 1
+                return False
+            
+            cover(best)
+            r = D[best]
+            while r != best:
+                partial.append(r)
+                j = R[r]
+                while j != r:
+                    cover(C[j])
+                    j = R[j]
+                done = search()
+                j = L[r]
+                while j != r:
+                    uncover(C[j])
+                    j = L[j]
+                partial.pop()
+                if done:
+                    uncover(best)
+                    return True
+                r = D[r]
+            uncover(best)
+            if stats is not None:
+                stats.backtracks += 1
+            return False
+        
+        search()
+        return found[0]
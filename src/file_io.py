@@ -1,25 +1,75 @@
-from typing import List
+from typing import Iterator, List, Optional
 from lang_manager import get_text
 
 
+# 1 行を区切りなしの数字で書く盤面の大きさ（数字が 1 桁に収まる盤面）
+COMPACT_SIZES = (4, 9)
+
+
 def load_board_from_file(filepath: str) -> List[List[int]]:
-    """テキストファイルから盤面を読み込む（9x9の2次元リスト）"""
+    """テキストファイルから盤面を読み込む（N x N の 2 次元リスト）
+    
+    1 行が盤面の 1 行で、9x9 以下の盤面は区切りなしの数字（例: 006700300）、
+    16x16 以上の盤面は空白区切りの数字（空きマスは 0 または .）で書く。
+    盤面の大きさは最初の行の数字の数で決め、以降は同じ数の行だけを盤面の行として読む
+    （大きさの違う数字だけの行は無視し、大きさと同じ数の行を読んだ時点で終える）。
+    """
     with open(filepath, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     board = []
     for line in lines:
-        line = line.strip()
-        if len(line) == 9 and all(c.isdigit() for c in line):
-            board.append([int(c) for c in line])
-    if len(board) != 9:
+        row = _parse_row(line.strip())
+        if row is None or (board and len(row) != len(board[0])):
+            continue
+        board.append(row)
+        if len(board) == len(board[0]):
+            break
+    if not board or len(board) != len(board[0]):
         raise ValueError(get_text("file_io.errors", "invalid_format"))
     return board
 
 
+def _parse_row(line: str) -> Optional[List[int]]:
+    """盤面の 1 行を数字のリストにする（盤面の行として読めない行は None）"""
+    if len(line) in COMPACT_SIZES and all(c.isdigit() for c in line):
+        return [int(c) for c in line]
+    tokens = ['0' if token == '.' else token for token in line.split()]
+    if len(tokens) > 1 and all(token.isdigit() for token in tokens):
+        return [int(token) for token in tokens]
+    return None
+
+
 def save_board_to_file(board: List[List[int]], filepath: str):
-    """2次元リストの盤面をテキストファイルに保存"""
+    """2次元リストの盤面をテキストファイルに保存（16x16 以上は空白区切り）"""
+    size = len(board)
+    width = len(str(size))
     with open(filepath, 'w', encoding='utf-8') as f:
         for row in board:
-            line = ''.join(str(num) for num in row)
+            if size in COMPACT_SIZES:
+                line = ''.join(str(num) for num in row)
+            else:
+                line = ' '.join(str(num).rjust(width) for num in row)
             f.write(line + '\n')
+
+
+def iter_puzzle_lines(filepath: str) -> Iterator[str]:
+    """1 行 1 問形式の問題集から問題の行を順に読み込む（空行と # で始まる行は読み飛ばす）"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def parse_puzzle_line(line: str) -> List[List[int]]:
+    """81 文字の 1 行（空きマスは 0 または .）を 9x9 の 2 次元リストに変換"""
+    line = line.strip().replace('.', '0')
+    if len(line) != 81 or not line.isdigit():
+        raise ValueError(get_text("file_io.errors", "invalid_format"))
+    return [[int(c) for c in line[i * 9:(i + 1) * 9]] for i in range(9)]
+
+
+def board_to_line(board: List[List[int]]) -> str:
+    """2次元リストの盤面を 81 文字の 1 行に変換"""
+    return ''.join(str(num) for row in board for num in row)
@@ -1,21 +1,28 @@
 import pygame
+import queue
 import threading
 import os
-import sys
-from solver import SudokuSolver
+from typing import Optional
+from solver_registry import create_solver, supports_animation
+from solve_limits import CancellationToken, LimitChecker, SolveLimits, SolveResult, SolveStatus
 from board import SudokuBoard
 from generator import SudokuGenerator
+from puzzle_bank import PuzzleBank, LOW_WATERMARK, CAPACITY
 from file_io import save_board_to_file
 from config import load_ui_settings
 from event_manager import EventManager
 from lang_manager import get_text
 
+
+# 探索スレッドから UI に送るステップのキューの大きさ（UI が追いつくまで探索を待たせる）
+STEP_QUEUE_SIZE = 4096
+
 class GameInitializationError(Exception):
     """ゲームの初期化時に発生するエラー"""
     pass
 
 class SudokuGame:
-    def __init__(self, input_file=None, ui_settings=None):
+    def __init__(self, input_file=None, ui_settings=None, solver_name="backtrack"):
         pygame.init()
         pygame.font.init()
         
@@ -41,7 +48,7 @@ class SudokuGame:
                     self.board = SudokuBoard()
                 else:
                     try:
-                        self.board = SudokuBoard.from_file(input_file)
+                        self.board = self._gui_board(SudokuBoard.from_file(input_file).board)
                         self.event_manager.notify('info', get_text("game.messages", "board_loaded"))
                     except ValueError as e:
                         self.event_manager.notify('error', get_text("game.messages", "invalid_file_format", str(e)))
@@ -55,15 +62,37 @@ class SudokuGame:
             self.event_manager.notify('error', get_text("game.messages", "board_init_error", str(e)))
             self.board = SudokuBoard()
         
-        self.solver = SudokuSolver(self.board)
+        # アニメーション表示に対応していないソルバーが指定された場合はバックトラッキングを使う
+        self.solver_name = solver_name if supports_animation(solver_name) else "backtrack"
+        # 解答中の探索の中断トークン（solving プロパティで操作する）
+        self.cancel_token = None
         self.solving = False
+        # 解答中に探索スレッドから受け取るステップのキュー（解答中でなければ None）
+        self.step_queue = None
+        self._solve_board = None
+        self._step_budget = 0.0
         self.solving_speed = 2550
         self.last_generated_difficulty = "medium"
         self.generator = SudokuGenerator()
+        # 生成済みの問題のバンク（在庫があれば生成を待たずに取り出し、減ったらバックグラウンドで補充する）
+        self.puzzle_bank = self._create_puzzle_bank(self.ui_config.get("puzzle_bank", {}))
         
         # UIは外部から設定する
         self.ui = None
     
+    @property
+    def solving(self) -> bool:
+        """解答中かどうか"""
+        return self.cancel_token is not None and not self.cancel_token.cancelled
+    
+    @solving.setter
+    def solving(self, value: bool):
+        """True で新しい中断トークンを作成し、False で実行中の探索に中断を要求する"""
+        if value:
+            self.cancel_token = CancellationToken()
+        elif self.cancel_token is not None:
+            self.cancel_token.cancel()
+    
     def set_ui(self, ui):
         """UI を設定するメソッド"""
         self.ui = ui
@@ -91,77 +120,123 @@ class SudokuGame:
             return
             
         self.solving = True
-        board_copy = self.board.copy()
-        solver = SudokuSolver(board_copy)
+        self._solve_board = self.board.copy()
+        solver = create_solver(self._solve_board, self.solver_name)
+        self.step_queue = queue.Queue(maxsize=STEP_QUEUE_SIZE)
+        self._step_budget = 0.0
         
-        # UI に盤面更新を通知するためのコールバック
-        def update_ui_callback():
-            # 現在の解答状態を反映
-            self.board.board = [row[:] for row in board_copy.board]
-            self.event_manager.notify('board_updated', self.board)
-            
-            # イベントを処理してUI操作を可能にする
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.solving = False
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    # クリック位置を取得
-                    pos = event.pos
-                    # 「解く」ボタンと「終了」ボタンのクリックを処理
-                    if self.ui:
-                        for label, rect in self.ui.buttons.items():
-                            if rect.collidepoint(pos):
-                                if label == get_text("ui.buttons", "solve"):
-                                    self.solving = False
-                                    # 中断時は現在の状態を保持
-                                    self.board.board = [row[:] for row in board_copy.board]
-                                    return
-                                elif label == get_text("ui.buttons", "exit"):
-                                    self.solving = False
-                                    pygame.quit()
-                                    sys.exit()
-            
-            # 描画を更新
-            if self.ui:
-                self.ui.renderer.draw_board()
-                self.ui.draw_buttons()
-                self.ui.renderer.draw_speed_slider(
-                    self.ui.slider_rect,
-                    self.ui.slider_button_rect,
-                    self.solving_speed
-                )
-                pygame.display.update()
+        # 探索はワーカースレッドで行い、UI はフレームごとに process_solve_steps() でステップを反映する
+        worker = threading.Thread(target=self._run_solver, args=(solver, self.cancel_token, self.step_queue),
+                                  daemon=True)
+        worker.start()
+    
+    def _run_solver(self, solver, token: CancellationToken, step_queue: queue.Queue):
+        """ワーカースレッドで探索し、ステップをキューに送る（最後に SolveResult を送る）"""
+        checker = LimitChecker(SolveLimits(token=token))
+        status = None
+        for step in solver.iter_steps():
+            if step.kind == "place":
+                status = checker.tick()
+            if status is None and not self._put_step(step_queue, step, token):
+                status = SolveStatus.CANCELLED
+            if status is not None:
+                break
+        if status is None:
+            status = SolveStatus.SOLVED if solver.solution_count > 0 else SolveStatus.UNSOLVABLE
+        self._put_step(step_queue, checker.result(status), token)
+    
+    def _put_step(self, step_queue: queue.Queue, item, token: CancellationToken) -> bool:
+        """キューに空きができるまで待って item を入れる（中断された場合は False）"""
+        while not token.cancelled:
+            try:
+                step_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def process_solve_steps(self, elapsed_ms: float):
+        """解答中のステップをキューから取り出して盤面に反映する（UI のフレームごとに呼ぶ）
         
-        # 解法実行
-        solved = solver.solve(True, update_ui_callback, self.solving_speed // 100, self)
+        速度スライダーの 1 ステップあたりの遅延から、経過時間ぶんの数字の配置を反映する。
+        
+        Args:
+            elapsed_ms: 前のフレームからの経過時間（ミリ秒）
+        """
+        if self.step_queue is None:
+            return
+        if not self.solving:
+            # 中断された場合は残りのステップを捨て、盤面は現在の状態のままにする
+            self.step_queue = None
+            return
         
-        if solved and self.solving:  # 解答が完了し、かつ中断されていない場合のみ結果を反映
-            self.board.board = [row[:] for row in board_copy.board]
+        delay = max(1, self.solving_speed // 100)
+        # 描画が遅れても一度に反映しすぎないよう、持ち越すのは 1 ステップ未満の端数だけにする
+        steps = elapsed_ms / delay
+        self._step_budget = min(self._step_budget + steps, steps + 1)
+        while self._step_budget >= 1:
+            try:
+                item = self.step_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, SolveResult):
+                self._finish_solve(item)
+                return
+            if item.kind == "place":
+                self.board.set_value(item.row, item.col, item.value)
+                self._step_budget -= 1
+            elif item.kind == "undo":
+                self.board.set_value(item.row, item.col, 0)
+    
+    def _finish_solve(self, result: SolveResult):
+        """ワーカースレッドの探索結果を反映"""
+        self.step_queue = None
+        if result.solved:
+            self.board.board = self._solve_board.board
             self.event_manager.notify('solve_completed', True)
-        elif not self.solving:
-            # 中断時は現在の状態を保持（既に update_ui_callback で反映済み）
+        elif result.status == SolveStatus.CANCELLED:
             self.event_manager.notify('solve_interrupted')
         else:
             self.event_manager.notify('solve_completed', False)
-        
         self.solving = False
     
     def generate_problem(self, difficulty: str):
-        """問題を生成"""
-        self.event_manager.notify('generation_started')
+        """問題を生成（問題バンクに在庫があればそこから取り出す）"""
+        problem = self.puzzle_bank.take(difficulty) if self.puzzle_bank is not None else None
         
-        # 進捗通知用のコールバック関数
-        def progress_callback(message):
-            self.event_manager.notify('generation_progress', message)
-        
-        # 問題を生成（プログレスコールバックを渡す）
-        problem = self.generator.generate(difficulty, progress_callback)
-        self.board = SudokuBoard(problem.board)  # board プロパティにアクセス
+        if problem is None:
+            self.event_manager.notify('generation_started')
+            
+            # 進捗通知用のコールバック関数
+            def progress_callback(message):
+                self.event_manager.notify('generation_progress', message)
+            
+            # 問題を生成（プログレスコールバックを渡す）
+            try:
+                problem = self.generator.generate(difficulty, progress_callback).copy()
+            except ValueError as e:
+                # 難易度の範囲に入る問題を作れなかった場合は、盤面を変えずに知らせる
+                self.event_manager.notify('generation_completed', self.board)
+                self.event_manager.notify('error', str(e))
+                return
+        self.board = problem
         
         # 生成完了イベントを通知
         self.event_manager.notify('generation_completed', self.board)
+        
+        # 盤面を表示してから、減った在庫の補充を始める
+        if self.puzzle_bank is not None:
+            self.puzzle_bank.start_refill()
+    
+    @staticmethod
+    def _create_puzzle_bank(bank_config) -> Optional[PuzzleBank]:
+        """UI 設定の puzzle_bank の項目から問題バンクを作り、補充を始める（enabled が false なら None）"""
+        if not bank_config.get("enabled", True):
+            return None
+        bank = PuzzleBank(bank_config.get("directory"), bank_config.get("low_watermark", LOW_WATERMARK),
+                          bank_config.get("capacity", CAPACITY))
+        bank.start_refill()
+        return bank
     
     def save_current_board(self, filepath: str):
         """盤面をファイルに保存"""
@@ -170,16 +245,33 @@ class SudokuGame:
     
     def load_board(self, board_data):
         """盤面をロード"""
-        self.board = SudokuBoard(board_data)
+        self.board = self._gui_board(board_data)
         self.event_manager.notify('board_loaded', self.board)
     
+    @staticmethod
+    def _gui_board(board_data) -> SudokuBoard:
+        """GUI で扱う盤面を作成（GUI は 9x9 の盤面のみ描画できるため、それ以外は ValueError）"""
+        board = SudokuBoard(board_data)
+        if board.size != 9:
+            raise ValueError(get_text("game.messages", "unsupported_size", None, board.size))
+        return board
+    
     def update_solving_speed(self, speed):
         """解答速度を更新"""
         self.solving_speed = speed
         
+    def close(self):
+        """解答を中断し、問題バンクの補充用プロセスを止める（何度呼んでもよい）"""
+        self.solving = False
+        if self.puzzle_bank is not None:
+            self.puzzle_bank.close()
+    
     def run(self):
-        """ゲームのメインループを実行（UI 側で実行される）"""
+        """ゲームのメインループを実行（UI 側で実行される。どの経路で終了しても close() を呼ぶ）"""
         if self.ui:
-            self.ui.run()
+            try:
+                self.ui.run()
+            finally:
+                self.close()
         else:
             raise ValueError("UI が設定されていません。先にset_ui()メソッドを呼び出してください。")
@@ -2,16 +2,81 @@ import random
 import pygame
 import sys
 import time
-from typing import List, Tuple, Callable, Optional
-from board import SudokuBoard
-from solver import SudokuSolver
+from typing import Dict, List, Tuple, Callable, Optional
+from board import SudokuBoard, mask_to_digits
+from canonical import random_transform
+from lang_manager import get_text
+from solver import count_solutions
+from solver_registry import AUTO, create_solver
+from solve_limits import SolveLimits
+from rater import DIFFICULTY_BANDS, DifficultyRating, in_band, rate
+from parallel_search import ParallelSearch
+
+
+# 9x9 の盤面で難易度ごとに最低限消すセルの数（点数が範囲に入っていても、ここまでは消し続ける）
+# 大きい盤面ではセル数に比例させる
+REMOVAL_TARGETS = {"easy": 35, "medium": 45, "hard": 55}
+
+# 9x9 の盤面で難易度ごとに消してよいセルの数の上限（None は制限なし。大きい盤面ではセル数に比例させる）
+# 易しい難易度の問題が、難しい難易度の問題よりヒントが少なくならないようにする
+REMOVAL_LIMITS = {"easy": 45, "medium": 54, "hard": None}
+
+# 難易度の範囲に入らなかった場合に、同じ完成盤面で消す順序を変えてやり直す回数
+MAX_REMOVAL_PASSES = 10
+
+# どの順序でも範囲に入らなかった場合に、完成盤面を作り直してやり直す回数
+MAX_FILL_ATTEMPTS = 3
+
+# 難易度ごとに問題を作れる盤面の大きさの下限
+# （4x4 の問題は消せるだけ消しても単一候補だけで解けてしまい、medium 以上の点数にならない）
+MIN_BAND_SIZES = {"easy": 4, "medium": 9, "hard": 9}
+
+# 9x9 より大きい盤面の一意解チェックで探索するノード数の上限（セルあたり）
+# 別の解を探す探索が長引く場合は、一意とみなせないものとしてセルを戻す
+UNIQUENESS_NODES_PER_CELL = 2
+
+# 一意解チェックを探索木の分割で並列化する盤面の大きさの下限
+# （9x9 では 1 回のチェックが短く、プロセス間のやり取りの方が高くつく）
+PARALLEL_MIN_SIZE = 16
+
+# 完成盤面の作り方
+FILL_BACKTRACK = "backtrack"   # 候補数の少ないセルからランダムに埋めるバックトラッキング
+FILL_TRANSFORM = "transform"   # 種の完成盤面に、解を解に写す変換をランダムにかける（盤面の大きさに比例する手間）
+FILL_MODES = (FILL_BACKTRACK, FILL_TRANSFORM)
+
+# FILL_TRANSFORM で使う盤面の大きさごとの種の完成盤面
+# （大きさを種にした固定の乱数のバックトラッキングで作るため、どのプロセスでも同じ盤面になる。作るのは最初の 1 回だけ）
+_SEED_GRIDS: Dict[int, List[List[int]]] = {}
+
+
+def supported_difficulties(size: int) -> List[str]:
+    """この大きさの盤面で問題を作れる難易度の一覧"""
+    return [d for d in DIFFICULTY_BANDS if size >= MIN_BAND_SIZES[d]]
 
 
 class SudokuGenerator:
     """問題生成器（難易度付き）"""
     
-    def __init__(self):
-        self.board = SudokuBoard()
+    def __init__(self, solver_name: str = AUTO, size: int = 9, jobs: int = 1, fill_mode: str = FILL_BACKTRACK):
+        """
+        Args:
+            solver_name: 一意解チェックに使うソルバー名（solver_registry に登録された名前）。
+                         "auto" の場合は最も速いソルバーを使う
+            size: 生成する盤面の大きさ（board.SUPPORTED_SIZES のいずれか）
+            jobs: 2 以上の場合、PARALLEL_MIN_SIZE 以上の盤面の一意解チェックを
+                  探索木の分割でこの数のワーカープロセスに分けて行う
+            fill_mode: 完成盤面の作り方（FILL_MODES のいずれか）。FILL_TRANSFORM は速いが、
+                       作る完成盤面はすべて盤面の大きさごとに固定の種の盤面を変換したものになる
+        """
+        self.size = size
+        self.board = SudokuBoard(size=size)
+        self.solver_name = solver_name
+        self.jobs = jobs
+        self.fill_mode = fill_mode
+        # 並列の一意解チェック（generate() の間だけ設定される）
+        self._parallel: Optional[ParallelSearch] = None
+        # 直近に生成した問題の難易度の判定結果
+        self.rating: Optional[DifficultyRating] = None
     
     def generate(self, difficulty: str, progress_callback: Optional[Callable] = None) -> SudokuBoard:
         """
@@ -23,175 +88,220 @@ class SudokuGenerator:
         
         Returns:
             SudokuBoard: 生成された問題
+        
+        Raises:
+            ValueError: この大きさの盤面では難易度の範囲に入る問題を作れない場合
         """
         if difficulty == "random":
-            difficulty = random.choice(["easy", "medium", "hard"])  # ランダムに難易度を選択
+            difficulty = random.choice(supported_difficulties(self.size))  # ランダムに難易度を選択
+        if self.size < MIN_BAND_SIZES.get(difficulty, MIN_BAND_SIZES["medium"]):
+            raise ValueError(get_text("generator.errors", "unsupported_difficulty", None, difficulty, self.size))
         
         # 進捗通知（コールバックがあれば）
         if progress_callback:
             progress_callback("問題を生成中です...")
         
-        # 少し待機して進捗表示を確実に表示させる
+        # 少し待機して進捗表示を確実に表示させる（表示がない場合は待たない）
         self._process_events()
-        time.sleep(0.1)  # UIが更新される時間を確保
+        if progress_callback:
+            time.sleep(0.1)  # UIが更新される時間を確保
         
-        attempt_count = 0
-        while True:
-            attempt_count += 1
-            
-            # 定期的に進捗を通知
-            if progress_callback and attempt_count % 2 == 0:
-                progress_callback(f"問題を生成中です... (試行: {attempt_count})")
-            
-            # イベント処理でUIの応答性を確保
-            self._process_events()
-            
-            # 問題生成ロジック
+        if self.jobs > 1 and self.size >= PARALLEL_MIN_SIZE:
+            self._parallel = ParallelSearch(self.jobs, self.solver_name)
+        try:
+            # セルは一意解を保つ場合だけ消すため、できた問題を解き直して確かめる必要はない
             board = self._generate_board(difficulty, progress_callback)
-            
-            # 解答可能性を確認
-            if progress_callback:
-                progress_callback("一意解を確認中...")
-            self._process_events()
-            
-            if self._is_solvable(board):
-                # 完了メッセージ（コールバックがあれば）
-                if progress_callback:
-                    progress_callback("問題の生成が完了しました")
-                return board
-            
-            # 再試行メッセージ（コールバックがあれば）
-            if progress_callback:
-                progress_callback("一意解にならないため再生成しています...")
-            
-            # イベント処理
-            self._process_events()
+        finally:
+            if self._parallel is not None:
+                self._parallel.close()
+                self._parallel = None
+        
+        # 完了メッセージ（コールバックがあれば）
+        if progress_callback:
+            progress_callback("問題の生成が完了しました")
+        return board
     
     def _process_events(self):
-        """pygame イベントを処理して UI の応答性を確保"""
+        """pygame イベントを処理して UI の応答性を確保（ウィンドウがない場合は何もしない）"""
+        if not pygame.display.get_init():
+            return
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
     
     def _generate_board(self, difficulty: str, progress_callback: Optional[Callable] = None) -> SudokuBoard:
-        """問題を生成する（難易度付き）"""
-        # 空の盤面を作成
-        self.board = SudokuBoard()
-        
-        # 進捗通知
-        if progress_callback:
-            progress_callback("完成盤面を作成中...")
-        self._process_events()
-        
-        # 完成された盤面を作成
-        self._fill_board()
+        """問題を生成する（難易度付き）
         
-        # 進捗通知
-        if progress_callback:
-            progress_callback(f"難易度 '{difficulty}' に調整中...")
-        self._process_events()
-        
-        # 難易度に応じてセルを削除
-        self._remove_cells(difficulty, progress_callback)
-        
-        return self.board
+        難易度の範囲に入らなければ完成盤面から作り直し、MAX_FILL_ATTEMPTS 回で入らなければ
+        範囲外の問題を返さずに ValueError を送出する。
+        """
+        for _ in range(MAX_FILL_ATTEMPTS):
+            # 空の盤面を作成
+            self.board = SudokuBoard(size=self.size)
+            
+            # 進捗通知
+            if progress_callback:
+                progress_callback("完成盤面を作成中...")
+            self._process_events()
+            
+            # 完成された盤面を作成
+            if self.fill_mode == FILL_TRANSFORM:
+                self._fill_board_by_transform()
+            else:
+                self._fill_board()
+            
+            # 進捗通知
+            if progress_callback:
+                progress_callback(f"難易度 '{difficulty}' に調整中...")
+            self._process_events()
+            
+            # 難易度に応じてセルを削除
+            if self._remove_cells(difficulty, progress_callback):
+                return self.board
+            if progress_callback:
+                progress_callback(f"難易度 '{difficulty}' の範囲に入らなかったため、完成盤面から作り直します")
+        raise ValueError(get_text("generator.errors", "band_not_reached", None, difficulty, self.rating.score))
     
-    def _fill_board(self) -> bool:
-        """完成された盤面を作成（バックトラッキング）"""
-        empty = self.board.find_empty()
-        if not empty:
+    def _fill_board(self, rng=random) -> bool:
+        """完成された盤面を作成（候補数の少ないセルから埋めるバックトラッキング）
+        
+        Args:
+            rng: 候補を試す順序を決める乱数（省略時は random モジュールの共有の乱数）
+        """
+        cell = self.board.find_most_constrained()
+        if cell is None:
             return True
         
-        row, col = empty
-        numbers = list(range(1, 10))
-        random.shuffle(numbers)
+        row, col, mask = cell
+        numbers = mask_to_digits(mask)
+        rng.shuffle(numbers)
         
         for num in numbers:
-            if self.board.is_valid(row, col, num):
-                self.board.set_value(row, col, num)
-                
-                # 定期的にイベント処理
-                if (row * 9 + col) % 20 == 0:
-                    self._process_events()
-                    
-                if self._fill_board():
-                    return True
-                self.board.set_value(row, col, 0)
-        return False
-    
-    def _remove_cells(self, difficulty: str, progress_callback: Optional[Callable] = None):
-        """難易度に応じてセルを消す（ランダム）"""
-        if difficulty == "easy":
-            to_remove = 35
-        elif difficulty == "hard":
-            to_remove = 55
-        else:  # default = medium
-            to_remove = 45
-        
-        count = 0
-        attempts = 0
-        max_attempts = 1000
-        last_progress_update = 0
-        
-        # 一意解になるまでセルを消す
-        while count < to_remove and attempts < max_attempts:
-            attempts += 1
+            self.board.set_value(row, col, num)
             
-            # 定期的に進捗を更新
-            if progress_callback and attempts - last_progress_update >= 50:
-                progress_callback(f"難易度調整中... ({count}/{to_remove})")
-                last_progress_update = attempts
+            # 定期的にイベント処理
+            if (row * self.size + col) % 20 == 0:
                 self._process_events()
             
-            row = random.randint(0, 8)
-            col = random.randint(0, 8)
-            
-            if self.board.get_value(row, col) != 0:
-                backup = self.board.get_value(row, col)
-                self.board.set_value(row, col, 0)
-                
-                # 一意解チェック（最低限の確認）
-                board_copy = SudokuBoard([row[:] for row in self.board.board])
-                solver = SudokuSolver(board_copy)
-                solutions = []
-                self._count_solutions(board_copy, solver, solutions, max_solutions=2)
+            if self._fill_board(rng):
+                return True
+            self.board.set_value(row, col, 0)
+        return False
+    
+    def _fill_board_by_transform(self) -> None:
+        """種の完成盤面にランダムな変換（数字の付け替え・行や列の入れ替え・転置）をかけて完成盤面を作成"""
+        seed = _SEED_GRIDS.get(self.size)
+        if seed is None:
+            # 種の盤面は大きさだけで決まる専用の乱数で作り、呼び出し側の乱数を消費しない
+            self._fill_board(random.Random(self.size))
+            seed = _SEED_GRIDS[self.size] = self.board.to_list()
+        self.board.board = random_transform(self.size).apply(seed)
+    
+    def _remove_cells(self, difficulty: str, progress_callback: Optional[Callable] = None) -> bool:
+        """一意解を保ち、難易度の点数が範囲に収まるようにセルを消す
+        
+        セルをランダムな順に 1 つずつ消し、複数解になる場合と点数が範囲の上限を超える場合は戻す。
+        REMOVAL_TARGETS の数以上を消して点数が範囲の下限に達した時点か、REMOVAL_LIMITS の数を消した時点で終了する。
+        下限に届かなければ、同じ完成盤面で消す順序を変えてやり直す。
+        
+        Returns:
+            bool: 難易度の範囲に入ったかどうか（入らなかった場合、盤面は最も点数の高かった問題になる）
+        """
+        low, high = DIFFICULTY_BANDS.get(difficulty, DIFFICULTY_BANDS["medium"])
+        to_remove = REMOVAL_TARGETS.get(difficulty, REMOVAL_TARGETS["medium"]) * self.size ** 2 // 81
+        limit = REMOVAL_LIMITS.get(difficulty, REMOVAL_LIMITS["medium"])
+        if limit is not None:
+            limit = limit * self.size ** 2 // 81
+        best = None
+        
+        # 完成盤面からの変更を記録し、やり直すときは盤面をコピーせずに取り消す
+        start = self.board.checkpoint()
+        try:
+            for _ in range(MAX_REMOVAL_PASSES):
+                cells = [(row, col) for row in range(self.size) for col in range(self.size)]
+                random.shuffle(cells)
+                count = 0
+                rating = rate(self.board)
                 
-                if len(solutions) != 1:
-                    self.board.set_value(row, col, backup)  # 戻す
-                else:
+                for attempts, (row, col) in enumerate(cells, 1):
+                    # 定期的に進捗を更新
+                    if progress_callback and attempts % 10 == 0:
+                        progress_callback(f"難易度調整中... ({count}/{to_remove})")
+                    if attempts % 10 == 0:
+                        self._process_events()
+                    
+                    backup = self.board.get_value(row, col)
+                    self.board.set_value(row, col, 0)
+                    
+                    # 一意解チェック（消す前の問題の解は完成盤面だけなので、消したセルが別の数字になる解がなければ一意）
+                    if self._has_other_solution(row, col, backup):
+                        self.board.set_value(row, col, backup)  # 戻す
+                        continue
+                    # 難しくなりすぎる場合も戻す
+                    new_rating = rate(self.board)
+                    if high is not None and new_rating.score > high:
+                        self.board.set_value(row, col, backup)
+                        continue
                     count += 1
-            
-            # 定期的にイベント処理
-            if attempts % 10 == 0:
-                self._process_events()
+                    rating = new_rating
+                    if count >= to_remove and rating.score >= low:
+                        break
+                    if count == limit:
+                        break
+                
+                if best is None or rating.score > best[0].score:
+                    best = (rating, self.board.copy())
+                if in_band(rating, difficulty):
+                    break
+                # 下限に届かなかったので、消したセルを取り消して完成盤面に戻し、消す順序を変える
+                self.board.rollback(start)
+        finally:
+            self.board.release()
+        
+        self.rating, problem = best
+        self.board.board = problem.board
         
         # 最終進捗更新
         if progress_callback:
             progress_callback(f"難易度調整完了 ({count}/{to_remove})")
+        return in_band(self.rating, difficulty)
     
-    def _count_solutions(self, board: SudokuBoard, solver: SudokuSolver, solutions: List[List[List[int]]], max_solutions: int):
-        """再帰的に解を数える（複数解検出用）"""
-        empty = board.find_empty()
-        if not empty:
-            solutions.append([row[:] for row in board.board])
-            return
+    def _has_other_solution(self, row: int, col: int, digit: int) -> bool:
+        """空けたセル (row, col) が digit 以外の数字になる解があるかどうか
         
-        # 空のセルを見つける
-        row, col = empty
-        for num in range(1, 10):
-            if board.is_valid(row, col, num):
+        候補の数字を 1 つずつ置き、解が 1 つでも見つかるかだけを調べる。
+        探索の上限に達して確かめられなかった場合も True を返す（一意とみなさない）。
+        """
+        board = self.board
+        mask = board.candidates_mask(row, col) & ~(1 << (digit - 1))
+        # 候補を試した変更は記録から取り除き、_remove_cells の記録には消した・戻したセルだけを残す
+        mark = board.checkpoint()
+        try:
+            for num in mask_to_digits(mask):
                 board.set_value(row, col, num)
-                self._count_solutions(board, solver, solutions, max_solutions)
-                if len(solutions) >= max_solutions:
-                    board.set_value(row, col, 0)  # 元に戻す前に早期リターン
-                    return
-                board.set_value(row, col, 0)
+                count = self._count_solutions(board, max_solutions=1)
+                board.rollback(mark)
+                if count != 0:
+                    return True
+            return False
+        finally:
+            board.rollback(mark)
+            board.release()
     
-    def _is_solvable(self, board: SudokuBoard) -> bool:
-        """盤面が解答可能かどうかを確認"""
-        if not isinstance(board, SudokuBoard):
-            board = SudokuBoard(board)  # リストの場合は SudokuBoard に変換
-        board_copy = SudokuBoard([row[:] for row in board.board])
-        solver = SudokuSolver(board_copy)
-        return solver.solve(animate=False)  # 解答可能なら True を返す
+    def _count_solutions(self, board: SudokuBoard, max_solutions: int) -> Optional[int]:
+        """解の個数を max_solutions を上限として数える
+        
+        9x9 より大きい盤面では探索するノード数を制限し、上限に達した場合は None を返す。
+        jobs が 2 以上の大きい盤面では、探索木を分割して並列に数える。
+        """
+        limits = None
+        if board.size > 9:
+            limits = SolveLimits(max_nodes=UNIQUENESS_NODES_PER_CELL * board.size ** 2)
+        if self._parallel is not None:
+            # ノード数の上限は部分問題ごとに適用される
+            return self._parallel.count_solutions(board, max_solutions, limits=limits)
+        if self.solver_name == AUTO:
+            return count_solutions(board, max_solutions, limits=limits)
+        # 盤面に数字を置いて探索するソルバーもあるため、コピーで数える（探索中の変更を盤面の記録に残さない）
+        return create_solver(board.copy(), self.solver_name).count_solutions(max_solutions, limits=limits)
@@ -2,6 +2,7 @@
 数独ソルバーアプリケーションのメインモジュール
 """
 import argparse
+import multiprocessing
 import sys
 import os
 from game import SudokuGame
@@ -9,6 +10,9 @@ from ui import SudokuUI
 from console import run_console
 from config import load_ui_settings
 from lang_manager import get_text, get_language_manager
+from solver_registry import AUTO, get_solver_names
+from board import SUPPORTED_SIZES
+from generator import FILL_BACKTRACK, FILL_MODES
 
 # Windows 環境での日本語表示対応
 if os.name == 'nt':
@@ -26,9 +30,33 @@ def main():
                         help='生成時の難易度（default: medium、random 指定可）')
     parser.add_argument('--output_dir', type=str, default='generated',
                         help='出力先フォルダ（default: ./generated）')
+    parser.add_argument('--size', type=int, choices=SUPPORTED_SIZES, default=9,
+                        help='生成する盤面の大きさ（default: 9、16 なら 16x16）')
+    parser.add_argument('--fill', choices=FILL_MODES, default=FILL_BACKTRACK,
+                        help='生成時の完成盤面の作り方（default: backtrack、transform は種の盤面の変換で高速に作る）')
+    parser.add_argument('--seed', type=int, help='生成の乱数の種（同じ種なら --jobs によらず同じ問題を生成する）')
+    parser.add_argument('--bank', action='store_true',
+                        help='--generate で問題バンクにある 9x9 の問題を先に使い、足りない分だけ生成する')
+    parser.add_argument('--fill_bank', action='store_true', help='問題バンクの在庫をすべての難易度で上限まで補充する')
     parser.add_argument('--language', type=str, choices=['ja', 'en'], help='言語設定（ja: 日本語, en: 英語）')
+    parser.add_argument('--solver', choices=[AUTO] + get_solver_names(), default=AUTO,
+                        help='使用するソルバー（default: auto、盤面に応じて自動選択。GUI ではアニメーション対応のソルバーのみ）')
+    parser.add_argument('--trace', type=str, help='コンソールモードで解答の過程をトレースファイルに記録する')
+    parser.add_argument('--replay', type=str, help='GUI でトレースファイルを再生する')
+    parser.add_argument('--batch', type=str, help='1 行 1 問形式の問題集ファイルをまとめて解く')
+    parser.add_argument('--jobs', type=int,
+                        help='ワーカープロセス数（--batch の default: CPU 数。--generate で 2 問以上を作る場合は'
+                             '問題ごとに分けて並列に生成する。1 問の解答と 16x16 以上の 1 問の生成では、'
+                             '2 以上を指定すると探索木を分割して並列に探索する）')
+    parser.add_argument('--split_depth', type=int, help='1 問を並列に解くときに探索木を分割する深さ（default: 自動）')
+    parser.add_argument('--chunk_size', type=int, default=256, help='--batch で 1 回の作業単位とする問題数（default: 256）')
+    parser.add_argument('--output', type=str, help='--batch の解答の出力先ファイル（default: 標準出力）')
+    parser.add_argument('--cache_size', type=int, default=4096,
+                        help='--batch でワーカーごとに保持する解答キャッシュの大きさ（default: 4096、0 で無効）')
+    parser.add_argument('--timeout', type=float, help='--batch で 1 問あたりの制限時間（秒）')
+    parser.add_argument('--max_nodes', type=int, help='--batch で 1 問あたりの探索ノード数の上限')
     args = parser.parse_args()
-
+    
     # UI設定を読み込む
     ui_settings_path = os.path.join(os.path.dirname(__file__), 'ui_setting.json')
     ui_settings = load_ui_settings(ui_settings_path)
@@ -46,21 +74,36 @@ def main():
     if args.language:
         ui_settings["language"] = args.language
     
-    if args.console:
-        run_console(args.file, args.verbose, language)
+    if args.batch:
+        from batch import run_batch
+        run_batch(args.batch, args.output, args.jobs, args.chunk_size, args.solver, language, args.cache_size,
+                  args.timeout, args.max_nodes, args.verbose)
+        sys.exit(0)
+    elif args.console:
+        run_console(args.file, args.verbose, language, args.solver, args.trace, args.jobs or 1, args.split_depth)
+    elif args.fill_bank:
+        from console import fill_puzzle_bank
+        fill_puzzle_bank(args.jobs or 1, args.fill, language)
+        sys.exit(0)
     elif args.generate:
         from console import generate_problems
-        generate_problems(args.generate, args.difficulty, args.output_dir, language)
+        generate_problems(args.generate, args.difficulty, args.output_dir, language, args.size, args.jobs or 1,
+                          args.fill, args.seed, args.bank)
         sys.exit(0)
     else:
         # ゲームインスタンスを作成し、UI設定を渡す
-        game = SudokuGame(args.file, ui_settings)
+        game = SudokuGame(args.file, ui_settings, args.solver)
         # UI インスタンスを作成し、ゲームをセット
         ui = SudokuUI(game)
         # UI をゲームにセット
         game.set_ui(ui)
+        # トレースファイルが指定された場合は再生を開始
+        if args.replay:
+            ui.start_replay(args.replay)
         # ゲームを実行
         game.run()
 
 if __name__ == "__main__":
+    # 実行ファイル（PyInstaller）から起動したワーカープロセスでは、main() を実行せずにワーカーとして動かす
+    multiprocessing.freeze_support()
     main()
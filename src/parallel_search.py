@@ -0,0 +1,319 @@
+"""
+探索木の分割による 1 問の並列探索
+
+盤面を制約伝播付きで指定の深さまで分岐させ、互いに重ならない部分問題に分ける。
+部分問題はプロセスプールの共有キューに積み、手の空いたワーカーから順に取り出して解く
+（早く終わったワーカーが残りの部分問題を引き受けるため、部分木の大きさの偏りがならされる）。
+解答では最初に解を見つけたワーカーが他を中断させ、解の個数は部分問題ごとの個数を合計する。
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+from board import SudokuBoard
+from propagation import ConstraintPropagator, BIT_TO_DIGIT
+from solver_registry import AUTO, create_solver
+from solve_limits import CancellationToken, SolveLimits, SolveResult, SolveStatus
+from solve_stats import SolveStats
+
+
+# 分割の深さを自動で決める場合に、ワーカー 1 つあたり用意する部分問題の数
+# （部分木の大きさは偏るため、ワーカー数より十分多く分けておく）
+TASKS_PER_JOB = 8
+
+# 分割の深さを自動で決める場合の最大の深さ
+MAX_SPLIT_DEPTH = 12
+
+# 結果を待つ間に中断トークンと制限時間を確認する間隔（秒）
+POLL_INTERVAL = 0.05
+
+# ワーカープロセスの中断トークン（プール全体で 1 つのイベントを共有する）
+_TOKEN: Optional[CancellationToken] = None
+
+
+def _init_worker(event) -> None:
+    """ワーカープロセスの初期化（共有イベントを中断トークンとして使う）"""
+    global _TOKEN
+    _TOKEN = CancellationToken(event)
+
+
+def _worker_limits(limits: Optional[SolveLimits]) -> SolveLimits:
+    """ワーカーで使う探索の上限（中断トークンを共有イベントのものに差し替える）"""
+    return (limits or SolveLimits())._replace(token=_TOKEN)
+
+
+def _solve_subproblem(board: SudokuBoard, solver_name: str, limits: Optional[SolveLimits],
+                      collect_stats: bool) -> Tuple[SolveResult, Optional[SudokuBoard], Optional[SolveStats]]:
+    """ワーカープロセスで部分問題を解き、結果と解いた盤面（解けなかった場合は None）と統計を返す"""
+    stats = SolveStats() if collect_stats else None
+    result = create_solver(board, solver_name).solve_with_limits(_worker_limits(limits), stats=stats)
+    return result, (board if result.solved else None), stats
+
+
+def _count_subproblem(board: SudokuBoard, solver_name: str, max_solutions: int, limits: Optional[SolveLimits],
+                      want_solution: bool) -> Tuple[Optional[int], Optional[List[List[int]]]]:
+    """ワーカープロセスで部分問題の解の個数を数え、個数（上限に達した場合は None）と最初の解を返す"""
+    if solver_name == AUTO:
+        solver_name = "dlx"
+    solution = [] if want_solution else None
+    count = create_solver(board, solver_name).count_solutions(max_solutions, solution=solution,
+                                                               limits=_worker_limits(limits))
+    return count, (solution or None)
+
+
+def split_board(board: SudokuBoard, depth: Optional[int] = None, min_tasks: int = 1) -> List[SudokuBoard]:
+    """盤面を探索木の分岐で部分問題に分ける（盤面は変更しない）
+    
+    各段で制約伝播を行ってから、候補数最小のセルの候補ごとに分岐する。
+    部分問題の解の集合は互いに重ならず、合わせると元の盤面の解の集合に一致する。
+    矛盾した枝は捨て、伝播だけで埋まった枝はそのまま（解けた盤面として）残す。
+    
+    Args:
+        board: 対象の盤面
+        depth: 分岐する深さ。None の場合は部分問題が min_tasks 個以上になるまで
+               （最大 MAX_SPLIT_DEPTH まで）分岐する
+        min_tasks: depth が None の場合に目標とする部分問題の数
+    
+    Returns:
+        List[SudokuBoard]: 部分問題の盤面（伝播で埋まったセルを含む）のリスト
+    """
+    frontier = _expand(board, branch=False)
+    max_depth = depth if depth is not None else MAX_SPLIT_DEPTH
+    level = 0
+    while level < max_depth and frontier:
+        if depth is None and len(frontier) >= min_tasks:
+            break
+        next_frontier = []
+        for sub in frontier:
+            next_frontier.extend(_expand(sub, branch=True))
+        if next_frontier == frontier:
+            # すべての枝が伝播だけで埋まった
+            break
+        frontier = next_frontier
+        level += 1
+    return frontier
+
+
+def _expand(board: SudokuBoard, branch: bool) -> List[SudokuBoard]:
+    """盤面に制約伝播を行い、branch が True なら候補数最小のセルで分岐した盤面のリストを返す
+    
+    伝播で矛盾した場合は空のリスト、空きセルが残らなければ埋まった盤面だけを返す。
+    """
+    work = board.copy()
+    size = work.size
+    propagator = ConstraintPropagator(work)
+    cands = propagator.initial_candidates()
+    if cands is None or not propagator.propagate(cands, []):
+        return []
+    idx = propagator.select_cell(cands)
+    if idx < 0 or not branch:
+        return [work]
+    
+    row, col = divmod(idx, size)
+    children = []
+    mask = cands[idx]
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        child = work.copy()
+        child.set_value(row, col, BIT_TO_DIGIT[bit])
+        children.extend(_expand(child, branch=False))
+    return children
+
+
+class ParallelSearch:
+    """1 問の探索木を分割し、プロセスプールで並列に探索するクラス
+    
+    プロセスプールは最初の探索で起動し、close() まで使い回す（with 文でも使える）。
+    """
+    
+    def __init__(self, jobs: Optional[int] = None, solver_name: str = AUTO, split_depth: Optional[int] = None):
+        """
+        Args:
+            jobs: ワーカープロセス数（省略時は CPU 数）
+            solver_name: 部分問題を解くソルバー名（"auto" の場合は部分問題ごとに自動選択し、
+                         解の個数は DLX で数える）
+            split_depth: 探索木を分割する深さ（省略時はワーカー数に応じて自動で決める）
+        """
+        self.jobs = jobs or os.cpu_count() or 1
+        self.solver_name = solver_name
+        self.split_depth = split_depth
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._event = None
+    
+    def __enter__(self) -> "ParallelSearch":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """実行中の探索を中断し、プロセスプールを終了する"""
+        if self._executor is not None:
+            self._event.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._event = None
+    
+    def solve(self, board: SudokuBoard, limits: Optional[SolveLimits] = None,
+              stats: Optional[SolveStats] = None) -> SolveResult:
+        """盤面を解き、解けた場合は盤面を解答で埋める（解けなかった場合、盤面は変更しない）
+        
+        最初に解を見つけた部分問題の解を採用し、残りのワーカーを中断させる。
+        
+        Args:
+            board: 解く対象の盤面
+            limits: 探索の上限（時間と中断トークンは全体に、ノード数は部分問題ごとに適用する）
+            stats: 指定すると各ワーカーの探索の統計を合計する
+        
+        Returns:
+            SolveResult: 結果の種類と全ワーカーで探索したノード数の合計
+        """
+        start_time = time.monotonic()
+        limits, token = self._split_limits(limits, start_time)
+        # 開始前と分割の後に中断・制限時間を確認し、打ち切る場合はワーカーに投入しない
+        interrupted = self._poll(limits, token)
+        if interrupted is None:
+            subproblems = split_board(board, self.split_depth, self.jobs * TASKS_PER_JOB)
+            interrupted = self._poll(limits, token)
+        if interrupted is not None:
+            return SolveResult(interrupted, 0, time.monotonic() - start_time)
+        if not subproblems:
+            return SolveResult(SolveStatus.UNSOLVABLE, 0, time.monotonic() - start_time)
+        
+        executor = self._get_executor()
+        futures = [executor.submit(_solve_subproblem, sub, self.solver_name, limits, stats is not None)
+                   for sub in subproblems]
+        nodes = 0
+        status = None
+        interrupted = None
+        try:
+            for future in self._iter_completed(futures, limits, token):
+                if future is None:
+                    # 中断トークンまたは制限時間で打ち切った
+                    interrupted = self._poll(limits, token)
+                    break
+                result, solution, sub_stats = future.result()
+                nodes += result.nodes
+                if stats is not None:
+                    stats.merge(sub_stats)
+                if result.solved:
+                    board.board = solution.board
+                    status = SolveStatus.SOLVED
+                    break
+                if result.status != SolveStatus.UNSOLVABLE:
+                    interrupted = result.status
+        finally:
+            self._cancel(futures)
+        
+        if status is None:
+            status = interrupted or SolveStatus.UNSOLVABLE
+        return SolveResult(status, nodes, time.monotonic() - start_time)
+    
+    def count_solutions(self, board: SudokuBoard, max_solutions: int = 2,
+                        solution: Optional[List[List[int]]] = None,
+                        limits: Optional[SolveLimits] = None) -> Optional[int]:
+        """解の個数を max_solutions を上限として数える（盤面は変更しない）
+        
+        部分問題ごとの個数を合計し、max_solutions に達した時点で残りのワーカーを中断させる。
+        
+        Args:
+            board: 対象の盤面
+            max_solutions: 数える解の上限
+            solution: リストを渡すと、最初に見つかった解（盤面と同じ大きさの 2 次元リスト）が格納される
+            limits: 探索の上限（時間と中断トークンは全体に、ノード数は部分問題ごとに適用する）
+        
+        Returns:
+            Optional[int]: 解の個数（max_solutions 以下）。上限に達して数えきれなかった場合は None
+        """
+        limits, token = self._split_limits(limits, time.monotonic())
+        if self._poll(limits, token) is not None:
+            return None
+        subproblems = split_board(board, self.split_depth, self.jobs * TASKS_PER_JOB)
+        if self._poll(limits, token) is not None:
+            return None
+        if not subproblems:
+            return 0
+        
+        executor = self._get_executor()
+        futures = [executor.submit(_count_subproblem, sub, self.solver_name, max_solutions, limits,
+                                   solution is not None)
+                   for sub in subproblems]
+        total = 0
+        exhausted = False
+        try:
+            for future in self._iter_completed(futures, limits, token):
+                if future is None:
+                    exhausted = True
+                    break
+                count, found = future.result()
+                if count is None:
+                    exhausted = True
+                    continue
+                if count and solution is not None and total == 0:
+                    solution[:] = found
+                total += count
+                if total >= max_solutions:
+                    return max_solutions
+        finally:
+            self._cancel(futures)
+        return None if exhausted else total
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """プロセスプールを返す（まだなければ起動する）"""
+        if self._executor is None:
+            self._event = multiprocessing.Event()
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                                 initargs=(self._event,))
+        else:
+            self._event.clear()
+        return self._executor
+    
+    def _split_limits(self, limits: Optional[SolveLimits],
+                      start_time: float) -> Tuple[Optional[SolveLimits], Optional[CancellationToken]]:
+        """探索の上限をワーカーに渡す部分と、呼び出し側で確認する中断トークンに分ける
+        
+        中断トークンはプロセス間で共有できないため呼び出し側で確認し、
+        制限時間は全体で共通の打ち切り時刻に変換する。
+        """
+        if limits is None:
+            return None, None
+        deadline = limits.deadline
+        if limits.timeout is not None:
+            timeout_deadline = start_time + limits.timeout
+            deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+        return limits._replace(timeout=None, deadline=deadline, token=None), limits.token
+    
+    def _poll(self, limits: Optional[SolveLimits], token: Optional[CancellationToken]) -> Optional[str]:
+        """呼び出し側の中断トークンと制限時間を確認する"""
+        if token is not None and token.cancelled:
+            return SolveStatus.CANCELLED
+        if limits is not None and limits.deadline is not None and time.monotonic() >= limits.deadline:
+            return SolveStatus.BUDGET_EXCEEDED
+        return None
+    
+    def _iter_completed(self, futures, limits: Optional[SolveLimits], token: Optional[CancellationToken]):
+        """終わった順に Future を返す（中断トークンまたは制限時間で打ち切る場合は None を返して終わる）
+        
+        終わった部分問題の結果も、受け取る前に中断と制限時間を確認する（打ち切った後の結果は使わない）。
+        """
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                if self._poll(limits, token) is not None:
+                    yield None
+                    return
+                if not future.cancelled():
+                    yield future
+            if pending and self._poll(limits, token) is not None:
+                yield None
+                return
+    
+    def _cancel(self, futures) -> None:
+        """未着手の部分問題を取り消し、実行中のワーカーを中断させて終わるのを待つ"""
+        self._event.set()
+        for future in futures:
+            future.cancel()
+        wait(futures)
@@ -0,0 +1,425 @@
+import time
+from typing import List, NamedTuple, Optional, Tuple
+from board import SudokuBoard, SUPPORTED_SIZES, box_size_of
+from solve_stats import SolveStats
+
+
+class Geometry(NamedTuple):
+    """盤面の大きさごとのユニットの構造（セル番号は row * size + col で表す）"""
+    size: int
+    cells: int                  # セル数（size * size）
+    row_units: List[List[int]]
+    col_units: List[List[int]]
+    box_units: List[List[int]]
+    units: List[List[int]]      # 行・列・ブロックのユニット（各 size 個）
+    peers: List[List[int]]      # 各セルと同じ行・列・ブロックに属する他のセル
+    # ブロックと行（列）の交差部分ごとの (交差セル, 行（列）の残りのセル, ブロックの残りのセル)
+    intersections: List[Tuple[List[int], List[int], List[int]]]
+
+
+def _build_geometry(size: int) -> Geometry:
+    box = box_size_of(size)
+    row_units = [[row * size + col for col in range(size)] for row in range(size)]
+    col_units = [[row * size + col for row in range(size)] for col in range(size)]
+    box_units = [
+        [(b // box * box + i // box) * size + b % box * box + i % box for i in range(size)]
+        for b in range(size)
+    ]
+    cell_box = [0] * (size * size)
+    for b, unit in enumerate(box_units):
+        for idx in unit:
+            cell_box[idx] = b
+    peers = [
+        sorted(set(row_units[idx // size] + col_units[idx % size] + box_units[cell_box[idx]]) - {idx})
+        for idx in range(size * size)
+    ]
+    intersections = []
+    for unit in box_units:
+        box_cells = set(unit)
+        for line in row_units + col_units:
+            if any(idx in box_cells for idx in line):
+                intersections.append((
+                    [idx for idx in line if idx in box_cells],
+                    [idx for idx in line if idx not in box_cells],
+                    [idx for idx in unit if idx not in line],
+                ))
+    return Geometry(size, size * size, row_units, col_units, box_units,
+                    row_units + col_units + box_units, peers, intersections)
+
+
+_GEOMETRIES = {9: _build_geometry(9)}
+
+
+def get_geometry(size: int) -> Geometry:
+    """盤面の大きさに対応するユニットの構造を返す（初回のみ作成）"""
+    geometry = _GEOMETRIES.get(size)
+    if geometry is None:
+        geometry = _GEOMETRIES[size] = _build_geometry(size)
+    return geometry
+
+
+# 9x9 の盤面のユニットの構造
+ROW_UNITS = _GEOMETRIES[9].row_units
+COL_UNITS = _GEOMETRIES[9].col_units
+BOX_UNITS = _GEOMETRIES[9].box_units
+UNITS = _GEOMETRIES[9].units
+PEERS = _GEOMETRIES[9].peers
+INTERSECTIONS = _GEOMETRIES[9].intersections
+
+# 単一ビットのマスクから数字への対応表（対応するすべての盤面の大きさで共通）
+BIT_TO_DIGIT = {1 << (num - 1): num for num in range(1, max(SUPPORTED_SIZES) + 1)}
+
+
+class ConstraintPropagator:
+    """論理的な推論で候補を絞り込むクラス
+    
+    候補は 81 要素のビットマスクのリスト（数字が入っているセルは 0）で表し、
+    確定した数字は盤面に直接書き込む。以下の手筋を変化がなくなるまで繰り返す。
+    
+    - naked single: 候補が 1 つしかないセル
+    - hidden single: ユニット内でその数字を置けるセルが 1 つしかない
+    - locked candidates: ブロック内の候補が 1 行（列）に限られる（pointing）、
+      行（列）内の候補が 1 ブロックに限られる（claiming）
+    - naked pair: ユニット内で同じ 2 候補だけを持つ 2 セル
+    - hidden pair: ユニット内で 2 つの数字が同じ 2 セルにしか置けない
+    """
+    
+    def __init__(self, board: SudokuBoard, stats: Optional[SolveStats] = None):
+        """
+        Args:
+            board: 対象の盤面
+            stats: 指定すると手筋ごとの適用数と propagate() の時間を加算する
+        """
+        self.board = board
+        self.stats = stats
+        geometry = get_geometry(board.size)
+        self.size = geometry.size
+        self.cells = geometry.cells
+        self.units = geometry.units
+        self.peers = geometry.peers
+        self.intersections = geometry.intersections
+        self.popcount = board.popcount
+        # 候補リストの変更の記録（(セル番号, 変更前のマスク) のリスト。checkpoint() の間だけ記録する）
+        self._trail: Optional[List[Tuple[int, int]]] = None
+        self._trail_depth = 0
+    
+    def initial_candidates(self) -> Optional[List[int]]:
+        """盤面から候補のリストを作成（重複がある、または候補のない空きセルがあれば None）"""
+        if not self.board.validate_full_board():
+            return None
+        size = self.size
+        cands = [0] * self.cells
+        for row in range(size):
+            for col in range(size):
+                if self.board.get_value(row, col) == 0:
+                    mask = self.board.candidates_mask(row, col)
+                    if mask == 0:
+                        return None
+                    cands[row * size + col] = mask
+        return cands
+    
+    def assign(self, cands: List[int], idx: int, num: int, placed: List[int]) -> bool:
+        """セルに数字を確定し、同じユニットの他のセルから候補を取り除く
+        
+        Args:
+            cands: 候補のリスト（変更される）
+            idx: セル番号
+            num: 置く数字
+            placed: 確定したセル番号を追記するリスト（やり直し用）
+        
+        Returns:
+            bool: 矛盾（候補のない空きセル）が生じなければ True
+        """
+        self.board.set_value(idx // self.size, idx % self.size, num)
+        placed.append(idx)
+        trail = self._trail
+        if trail is not None:
+            trail.append((idx, cands[idx]))
+        cands[idx] = 0
+        bit = 1 << (num - 1)
+        for peer in self.peers[idx]:
+            mask = cands[peer]
+            if mask & bit:
+                new_mask = mask & ~bit
+                if new_mask == 0:
+                    return False
+                if trail is not None:
+                    trail.append((peer, mask))
+                cands[peer] = new_mask
+        return True
+    
+    def checkpoint(self) -> Tuple[int, int]:
+        """盤面と候補リストの変更の記録を開始し、rollback() に渡す現在の位置を返す
+        
+        盤面の変更は SudokuBoard.checkpoint() で記録する。checkpoint() と release() は対にして呼ぶ（入れ子にできる）。
+        """
+        if self._trail is None:
+            self._trail = []
+        self._trail_depth += 1
+        return self.board.checkpoint(), len(self._trail)
+    
+    def rollback(self, cands: List[int], mark: Tuple[int, int]) -> None:
+        """checkpoint() が返した位置より後の盤面と候補リストの変更を新しい順に取り消す"""
+        board_mark, trail_mark = mark
+        self.board.rollback(board_mark)
+        trail = self._trail
+        while len(trail) > trail_mark:
+            idx, mask = trail.pop()
+            cands[idx] = mask
+    
+    def release(self) -> None:
+        """checkpoint() に対応する記録を終える（最も外側の release() で記録を捨てる。変更はそのまま残る）"""
+        self.board.release()
+        self._trail_depth -= 1
+        if self._trail_depth == 0:
+            self._trail = None
+    
+    def select_cell(self, cands: List[int]) -> int:
+        """候補数が最も少ない空きセルの番号を返す（空きセルがなければ -1）"""
+        best = -1
+        best_count = self.size + 1
+        popcount = self.popcount
+        for idx in range(self.cells):
+            mask = cands[idx]
+            if mask:
+                count = popcount[mask]
+                if count < best_count:
+                    best = idx
+                    best_count = count
+                    if count <= 2:
+                        break
+        return best
+    
+    def propagate_singles(self, cands: List[int], placed: List[int]) -> bool:
+        """naked single と hidden single だけを変化がなくなるまで適用する
+        
+        Returns:
+            bool: 矛盾が見つからなければ True
+        """
+        while True:
+            result = self._apply_singles(cands, placed)
+            if result is None:
+                return False
+            if not result:
+                return True
+    
+    def propagate(self, cands: List[int], placed: List[int]) -> bool:
+        """手筋を変化がなくなるまで適用する
+        
+        Returns:
+            bool: 矛盾が見つからなければ True
+        """
+        if self.stats is None:
+            return self._propagate(cands, placed)
+        start = time.perf_counter()
+        ok = self._propagate(cands, placed)
+        self.stats.propagation_time += time.perf_counter() - start
+        return ok
+    
+    def _propagate(self, cands: List[int], placed: List[int]) -> bool:
+        while True:
+            result = self._apply_singles(cands, placed)
+            if result is None:
+                return False
+            if result:
+                continue
+            result = self._apply_eliminations(cands)
+            if result is None:
+                return False
+            if not result:
+                return True
+    
+    def apply_easiest(self, cands: List[int], placed: List[int]) -> Tuple[bool, Optional[str]]:
+        """進展のある最も易しい手筋を 1 回だけ適用する（難易度の判定用）
+        
+        Returns:
+            Tuple[bool, Optional[str]]: 矛盾が見つからなければ True と、適用した手筋の名前
+                                        （どの手筋でも進展がなければ None）
+        """
+        for name, technique in (("naked_single", self._apply_naked_singles),
+                                ("hidden_single", self._apply_hidden_singles)):
+            result = technique(cands, placed)
+            if result is None:
+                return False, name
+            if result:
+                return True, name
+        for name, technique in self._elimination_techniques():
+            result = technique(cands)
+            if result is None:
+                return False, name
+            if result:
+                return True, name
+        return True, None
+    
+    def _apply_singles(self, cands: List[int], placed: List[int]) -> Optional[int]:
+        """naked single と hidden single を適用し、確定したセル数を返す（矛盾時は None）"""
+        naked_count = self._apply_naked_singles(cands, placed)
+        if naked_count is None:
+            return None
+        hidden_count = self._apply_hidden_singles(cands, placed)
+        if hidden_count is None:
+            return None
+        return naked_count + hidden_count
+    
+    def _apply_naked_singles(self, cands: List[int], placed: List[int]) -> Optional[int]:
+        """naked single を適用し、確定したセル数を返す（矛盾時は None）"""
+        count = 0
+        popcount = self.popcount
+        for idx in range(self.cells):
+            mask = cands[idx]
+            if mask and popcount[mask] == 1:
+                if not self.assign(cands, idx, BIT_TO_DIGIT[mask], placed):
+                    return None
+                count += 1
+        if self.stats is not None:
+            self.stats.eliminations["naked_single"] += count
+        return count
+    
+    def _apply_hidden_singles(self, cands: List[int], placed: List[int]) -> Optional[int]:
+        """hidden single を適用し、確定したセル数を返す（矛盾時は None）"""
+        count = 0
+        size = self.size
+        all_digits = self.board.all_digits
+        for unit in self.units:
+            seen_once = 0
+            seen_twice = 0
+            filled = 0
+            for idx in unit:
+                mask = cands[idx]
+                if mask == 0:
+                    filled |= 1 << (self.board.get_value(idx // size, idx % size) - 1)
+                seen_twice |= seen_once & mask
+                seen_once |= mask
+            if (seen_once | filled) != all_digits:
+                # どこにも置けない数字がある
+                return None
+            singles = seen_once & ~seen_twice
+            while singles:
+                bit = singles & -singles
+                singles ^= bit
+                for idx in unit:
+                    if cands[idx] & bit:
+                        if not self.assign(cands, idx, BIT_TO_DIGIT[bit], placed):
+                            return None
+                        count += 1
+                        break
+        if self.stats is not None:
+            self.stats.eliminations["hidden_single"] += count
+        return count
+    
+    def _apply_eliminations(self, cands: List[int]) -> Optional[int]:
+        """候補を消去する手筋を適用し、消去した候補の数を返す（矛盾時は None）"""
+        removed = 0
+        for name, technique in self._elimination_techniques():
+            result = technique(cands)
+            if result is None:
+                return None
+            if self.stats is not None:
+                self.stats.eliminations[name] += result
+            removed += result
+            if removed:
+                # 安価な手筋（single）から再開する
+                return removed
+        return removed
+    
+    def _elimination_techniques(self):
+        """候補を消去する手筋の (名前, メソッド) を易しい順に返す"""
+        return (("locked_candidates", self._locked_candidates),
+                ("naked_pair", self._naked_pairs),
+                ("hidden_pair", self._hidden_pairs))
+    
+    def _eliminate(self, cands: List[int], cells: List[int], bits: int) -> Optional[int]:
+        """cells から bits の候補を取り除き、取り除いた候補の数を返す（矛盾時は None）"""
+        removed = 0
+        popcount = self.popcount
+        trail = self._trail
+        for idx in cells:
+            mask = cands[idx]
+            if mask & bits:
+                new_mask = mask & ~bits
+                if new_mask == 0:
+                    return None
+                removed += popcount[mask & bits]
+                if trail is not None:
+                    trail.append((idx, mask))
+                cands[idx] = new_mask
+        return removed
+    
+    def _locked_candidates(self, cands: List[int]) -> Optional[int]:
+        """pointing と claiming を適用"""
+        removed = 0
+        for segment, line_rest, box_rest in self.intersections:
+            seg_mask = 0
+            for idx in segment:
+                seg_mask |= cands[idx]
+            if not seg_mask:
+                continue
+            line_mask = 0
+            for idx in line_rest:
+                line_mask |= cands[idx]
+            box_mask = 0
+            for idx in box_rest:
+                box_mask |= cands[idx]
+            # pointing: ブロック内でこの行（列）にしか置けない数字は、行（列）の他のセルから消せる
+            pointing = seg_mask & ~box_mask & line_mask
+            if pointing:
+                result = self._eliminate(cands, line_rest, pointing)
+                if result is None:
+                    return None
+                removed += result
+            # claiming: 行（列）内でこのブロックにしか置けない数字は、ブロックの他のセルから消せる
+            claiming = seg_mask & ~line_mask & box_mask
+            if claiming:
+                result = self._eliminate(cands, box_rest, claiming)
+                if result is None:
+                    return None
+                removed += result
+        return removed
+    
+    def _naked_pairs(self, cands: List[int]) -> Optional[int]:
+        """naked pair を適用"""
+        removed = 0
+        popcount = self.popcount
+        for unit in self.units:
+            pairs = {}
+            for idx in unit:
+                mask = cands[idx]
+                if popcount[mask] == 2:
+                    if mask in pairs:
+                        others = [other for other in unit if other != idx and other != pairs[mask]]
+                        result = self._eliminate(cands, others, mask)
+                        if result is None:
+                            return None
+                        removed += result
+                    else:
+                        pairs[mask] = idx
+        return removed
+    
+    def _hidden_pairs(self, cands: List[int]) -> Optional[int]:
+        """hidden pair を適用"""
+        removed = 0
+        popcount = self.popcount
+        for unit in self.units:
+            # 数字ごとに、置けるセルの位置（ユニット内の 0〜size-1）のビットマスクを作る
+            places = {}
+            for pos, idx in enumerate(unit):
+                mask = cands[idx]
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    places[bit] = places.get(bit, 0) | (1 << pos)
+            twos = {}
+            for bit, where in places.items():
+                if popcount[where] == 2:
+                    if where in twos:
+                        pair = bit | twos[where]
+                        for pos in range(len(unit)):
+                            if where & (1 << pos):
+                                idx = unit[pos]
+                                extra = cands[idx] & ~pair
+                                if extra:
+                                    removed += popcount[extra]
+                                    cands[idx] &= pair
+                    else:
+                        twos[where] = bit
+        return removed
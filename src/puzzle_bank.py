@@ -0,0 +1,214 @@
+"""
+難易度別の問題バンク
+
+生成済みの 9x9 の問題を難易度ごとに 1 行 1 問形式のファイル（<難易度>.txt）に蓄えておき、
+GUI の「生成」やコンソールモードの --generate --bank では生成を待たずに取り出す。
+在庫が下限（low_watermark）を下回った難易度は、優先度を下げた補充用のワーカープロセスで
+上限（capacity）まで生成して補充する。ファイルへの書き込みはバンクを持つプロセスだけが行う
+（ワーカーは問題を生成して返すだけ）。書き込みは一時ファイルを置き換えて行うため、
+途中で終了してもファイルが壊れることはない。
+"""
+import multiprocessing
+import os
+import random
+import threading
+from functools import partial
+from typing import Dict, List, Optional
+from board import SudokuBoard
+from generator import SudokuGenerator, FILL_BACKTRACK
+from file_io import iter_puzzle_lines, parse_puzzle_line, board_to_line
+from rater import DIFFICULTY_BANDS
+
+
+# バンクで扱う難易度
+DIFFICULTIES = tuple(DIFFICULTY_BANDS)
+
+# 問題バンクの既定のフォルダ（src/puzzle_bank）
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzle_bank")
+
+# 在庫がこの数を下回った難易度を補充する
+LOW_WATERMARK = 3
+
+# 補充するときの在庫の上限
+CAPACITY = 10
+
+# 補充用のワーカープロセスに設定する nice 値（os.nice がない環境では設定しない）
+REFILL_NICENESS = 19
+
+
+def _lower_priority() -> None:
+    """補充用のワーカープロセスの優先度を下げる（GUI の描画を妨げないようにする）"""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(REFILL_NICENESS)
+        except OSError:
+            pass
+
+
+def _generate_line(difficulty: str, fill_mode: str, seed: int) -> str:
+    """補充用のワーカープロセスで 1 問生成し、1 行形式で返す"""
+    random.seed(seed)
+    board = SudokuGenerator(fill_mode=fill_mode).generate(difficulty)
+    return board_to_line(board.to_list())
+
+
+class PuzzleBank:
+    """難易度別に生成済みの問題を蓄え、在庫が減ったらバックグラウンドで補充するクラス
+    
+    take() と add() はスレッドセーフで、補充の結果は補充用プロセスの結果を受け取るスレッドから追加される。
+    """
+    
+    def __init__(self, directory: Optional[str] = None, low_watermark: int = LOW_WATERMARK,
+                 capacity: int = CAPACITY, fill_mode: str = FILL_BACKTRACK):
+        """
+        Args:
+            directory: 問題を保存するフォルダ（省略時は DEFAULT_DIRECTORY）
+            low_watermark: 在庫がこの数を下回った難易度を補充する
+            capacity: 補充するときの在庫の上限
+            fill_mode: 補充で生成するときの完成盤面の作り方（generator.FILL_MODES のいずれか）
+        """
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.low_watermark = low_watermark
+        self.capacity = max(capacity, low_watermark)
+        self.fill_mode = fill_mode
+        self._lock = threading.Lock()
+        self._stock: Dict[str, List[str]] = {d: self._load(d) for d in DIFFICULTIES}
+        # 補充用のワーカーで生成中の問題の数
+        self._pending: Dict[str, int] = {d: 0 for d in DIFFICULTIES}
+        self._pool = None
+    
+    def count(self, difficulty: str) -> int:
+        """難易度の在庫の数を返す"""
+        with self._lock:
+            return len(self._stock[difficulty])
+    
+    def resolve_difficulty(self, difficulty: str) -> str:
+        """"random" を在庫のある難易度からランダムに選んだ難易度に置き換える（在庫がなければ全難易度から選ぶ）"""
+        if difficulty != "random":
+            return difficulty
+        with self._lock:
+            stocked = [d for d in DIFFICULTIES if self._stock[d]]
+        return random.choice(stocked or DIFFICULTIES)
+    
+    def take(self, difficulty: str) -> Optional[SudokuBoard]:
+        """難易度の問題を 1 つ取り出す（在庫がなければ None）
+        
+        Args:
+            difficulty: 難易度（"random" の場合は在庫のある難易度から選ぶ）
+        """
+        difficulty = self.resolve_difficulty(difficulty)
+        with self._lock:
+            stock = self._stock.get(difficulty)
+            while stock:
+                line = stock.pop()
+                self._save(difficulty)
+                try:
+                    return SudokuBoard(parse_puzzle_line(line))
+                except ValueError:
+                    # 壊れた行は捨てて次の問題を使う
+                    continue
+        return None
+    
+    def add(self, difficulty: str, board: SudokuBoard) -> None:
+        """難易度の在庫に問題を追加する"""
+        self._add_line(difficulty, board_to_line(board.to_list()))
+    
+    def start_refill(self) -> None:
+        """在庫が下限を下回った難易度について、上限までの補充をバックグラウンドで始める（すぐに戻る）"""
+        with self._lock:
+            for difficulty in DIFFICULTIES:
+                stocked = len(self._stock[difficulty]) + self._pending[difficulty]
+                if stocked >= self.low_watermark:
+                    continue
+                pool = self._get_pool()
+                for _ in range(self.capacity - stocked):
+                    self._pending[difficulty] += 1
+                    pool.apply_async(_generate_line, (difficulty, self.fill_mode, random.getrandbits(64)),
+                                     callback=partial(self._on_generated, difficulty),
+                                     error_callback=partial(self._on_failed, difficulty))
+    
+    def fill(self, jobs: int = 1) -> int:
+        """すべての難易度の在庫を上限まで補充する（終わるまで戻らない）
+        
+        Args:
+            jobs: ワーカープロセス数（bulk_generate.iter_generated に渡す）
+        
+        Returns:
+            int: 追加した問題の数
+        """
+        from bulk_generate import iter_generated
+        
+        added = 0
+        for difficulty in DIFFICULTIES:
+            missing = self.capacity - self.count(difficulty)
+            if missing <= 0:
+                continue
+            for puzzle in iter_generated(missing, difficulty, fill_mode=self.fill_mode, jobs=jobs):
+                self.add(difficulty, puzzle.board)
+                added += 1
+        return added
+    
+    def close(self) -> None:
+        """補充用のワーカープロセスを止める（生成中の問題は捨てる）"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._pending = {d: 0 for d in DIFFICULTIES}
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    
+    def _get_pool(self):
+        """補充用のプロセスプールを返す（まだなければ起動する）
+        
+        GUI のプロセスは描画用のスレッドや SDL の状態を持つため、fork ではなく spawn で起動する。
+        """
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(1, initializer=_lower_priority)
+        return self._pool
+    
+    def _on_generated(self, difficulty: str, line: str) -> None:
+        """補充用のワーカーで生成した問題を在庫に加える"""
+        self._add_line(difficulty, line, refill=True)
+    
+    def _on_failed(self, difficulty: str, error: BaseException) -> None:
+        """補充用のワーカーでの生成が失敗した"""
+        with self._lock:
+            self._pending[difficulty] = max(0, self._pending[difficulty] - 1)
+    
+    def _add_line(self, difficulty: str, line: str, refill: bool = False) -> None:
+        """在庫に 1 行形式の問題を加えて保存する"""
+        with self._lock:
+            if refill:
+                if self._pool is None:
+                    # close() の後に届いた結果は捨てる
+                    return
+                self._pending[difficulty] = max(0, self._pending[difficulty] - 1)
+            self._stock[difficulty].append(line)
+            self._save(difficulty)
+    
+    def _path(self, difficulty: str) -> str:
+        """難易度の問題を保存するファイルのパス"""
+        return os.path.join(self.directory, f"{difficulty}.txt")
+    
+    def _load(self, difficulty: str) -> List[str]:
+        """難易度のファイルから在庫を読み込む（ファイルがなければ空）"""
+        path = self._path(difficulty)
+        if not os.path.exists(path):
+            return []
+        try:
+            return list(iter_puzzle_lines(path))
+        except OSError:
+            return []
+    
+    def _save(self, difficulty: str) -> None:
+        """難易度の在庫をファイルに書き出す（書き込めない場合はメモリ上の在庫だけを使う）"""
+        path = self._path(difficulty)
+        temp_path = path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(line + '\n' for line in self._stock[difficulty])
+            os.replace(temp_path, path)
+        except OSError:
+            pass
@@ -0,0 +1,128 @@
+"""
+手筋による問題の難易度判定
+
+問題を易しい手筋から順に（進展のある最も易しい手筋を 1 回ずつ）解き進め、
+必要だった最も難しい手筋と、手筋だけで解けなかった場合の探索量から難易度を点数化する。
+SudokuGenerator はこの点数を見ながらセルを消し、指定された難易度の範囲に収める。
+"""
+from typing import List, NamedTuple, Optional
+from board import SudokuBoard
+from propagation import ConstraintPropagator, BIT_TO_DIGIT
+
+
+# 手筋ごとの点数（その手筋が必要な問題の難易度）
+TECHNIQUE_SCORES = {
+    "naked_single": 1,
+    "hidden_single": 2,
+    "locked_candidates": 4,
+    "naked_pair": 5,
+    "hidden_pair": 6,
+}
+
+# 手筋だけでは解けず、探索（仮置き）が必要な問題の点数（仮置きの回数を加算する）
+SEARCH_SCORE = 10
+
+# 探索量を数える仮置きの回数の上限
+MAX_GUESSES = 1000
+
+# 難易度ごとの点数の範囲（下限, 上限）。上限の None は制限なし
+DIFFICULTY_BANDS = {
+    "easy": (1, 2),
+    "medium": (4, 5),
+    "hard": (6, None),
+}
+
+
+class DifficultyRating(NamedTuple):
+    """難易度の判定結果"""
+    score: int                 # 難易度の点数（大きいほど難しい）
+    technique: Optional[str]   # 必要だった最も難しい手筋（数字を置く必要がなければ None）
+    guesses: int = 0           # 手筋で行き詰まった後の探索で仮置きした回数
+    
+    @property
+    def needs_search(self) -> bool:
+        """手筋だけでは解けないかどうか"""
+        return self.score >= SEARCH_SCORE
+
+
+def rate(board: SudokuBoard) -> Optional[DifficultyRating]:
+    """盤面の難易度を判定する（盤面は変更しない）
+    
+    盤面をコピーせずに解き進め、置いた数字は最後にまとめて取り消す。
+    
+    Args:
+        board: 対象の盤面（一意解の問題であること）
+    
+    Returns:
+        Optional[DifficultyRating]: 判定結果（矛盾があって解けない場合は None）
+    """
+    mark = board.checkpoint()
+    try:
+        return _rate(ConstraintPropagator(board))
+    finally:
+        board.rollback(mark)
+        board.release()
+
+
+def _rate(propagator: ConstraintPropagator) -> Optional[DifficultyRating]:
+    """propagator の盤面を手筋で解き進めて難易度を判定する（盤面は解き進めた状態のままになる）"""
+    cands = propagator.initial_candidates()
+    if cands is None:
+        return None
+    
+    placed = []
+    hardest = None
+    while any(cands):
+        ok, technique = propagator.apply_easiest(cands, placed)
+        if not ok:
+            return None
+        if technique is None:
+            break
+        if hardest is None or TECHNIQUE_SCORES[technique] > TECHNIQUE_SCORES[hardest]:
+            hardest = technique
+    
+    score = TECHNIQUE_SCORES[hardest] if hardest is not None else 0
+    if not any(cands):
+        return DifficultyRating(score, hardest)
+    
+    # 手筋で行き詰まった盤面から、解が見つかるまでの仮置きの回数を数える
+    counter = [0]
+    if not _search(propagator, cands, placed, counter):
+        return None
+    guesses = counter[0]
+    return DifficultyRating(SEARCH_SCORE + guesses, hardest, guesses)
+
+
+def in_band(rating: DifficultyRating, difficulty: str) -> bool:
+    """判定結果が難易度の範囲に収まっているかどうか"""
+    low, high = DIFFICULTY_BANDS[difficulty]
+    return rating.score >= low and (high is None or rating.score <= high)
+
+
+def _search(propagator: ConstraintPropagator, cands: List[int], placed: List[int], counter: List[int]) -> bool:
+    """候補数最小のセルに仮置きして手筋で解き進め、解が見つかれば True を返す
+    
+    counter[0] に仮置きの回数を加算する（MAX_GUESSES に達したら打ち切って True を返す）。
+    仮置きごとに候補リストをコピーせず、失敗した仮置きは盤面と候補リストの変更の記録で取り消す。
+    """
+    idx = propagator.select_cell(cands)
+    if idx < 0:
+        return True
+    mask = cands[idx]
+    while mask:
+        if counter[0] >= MAX_GUESSES:
+            return True
+        bit = mask & -mask
+        mask ^= bit
+        counter[0] += 1
+        start = len(placed)
+        mark = propagator.checkpoint()
+        try:
+            if propagator.assign(cands, idx, BIT_TO_DIGIT[bit], placed) and propagator.propagate(cands, placed):
+                if _search(propagator, cands, placed, counter):
+                    return True
+            propagator.rollback(cands, mark)
+        finally:
+            propagator.release()
+        del placed[start:]
+    return False
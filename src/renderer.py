@@ -2,9 +2,14 @@ import pygame
 from typing import List, Dict, Any
 from board import SudokuBoard
 from solver import SudokuSolver
+from solve_trace import TraceReader, RECORD_SIZE, apply_records
 from lang_manager import get_text
 
 
+# トレース再生時の 1 フレームあたりのステップ数（速度 1 で 1、速度 100 でこの値）
+MAX_REPLAY_STEPS_PER_FRAME = 100000
+
+
 class SudokuRenderer:
     """数独を描画するためのクラス"""
     
@@ -21,6 +26,11 @@ class SudokuRenderer:
         self.height = ui_config["window"]["height"]
         self.message_area_height = ui_config.get("message_area_height", 50)
         self.origin_x, self.origin_y = ui_config.get("board_origin", [0, 0])
+        
+        # トレース再生の状態
+        self.replay = None
+        self.replay_steps = 0
+        self._replay_cells = None
     
     def draw_board(self):
         """盤面を描画"""
@@ -60,7 +70,7 @@ class SudokuRenderer:
         
         # スライダーの上に解答速度を表示（1-100 のレンジ）
         # 表示値が1のとき実際の速度が最遅(内部値5000)、表示値が100のとき最速(内部値100)
-        display_speed = int(99 - (solving_speed - 100) / 4900 * 99) + 1  # 内部値を1-100に変換
+        display_speed = self._display_speed(solving_speed)
         font = pygame.font.SysFont(self.fonts["default"], self.fonts["speed_size"])
         text = font.render(f"{get_text('renderer', 'solving_speed')}: {display_speed}", True, self.colors["text_default"])
         text_rect = text.get_rect(center=(slider_rect.centerx, slider_rect.top - 20))
@@ -77,6 +87,49 @@ class SudokuRenderer:
         self.window.blit(slow_text, slow_rect)
         self.window.blit(fast_text, fast_rect)
     
+    @staticmethod
+    def _display_speed(solving_speed: int) -> int:
+        """速度スライダーの内部値（100〜5000）を表示用の 1〜100 に変換"""
+        return int(99 - (solving_speed - 100) / 4900 * 99) + 1
+    
+    @property
+    def replaying(self) -> bool:
+        """トレースを再生中かどうか"""
+        return self.replay is not None
+    
+    def start_replay(self, reader: TraceReader):
+        """トレースの再生を開始（self.board は reader.initial_board の盤面であること）"""
+        self.stop_replay()
+        self.replay = reader
+        self.replay_steps = 0
+        self._replay_cells = [num for row in reader.initial_board for num in row]
+    
+    def replay_steps_per_frame(self, solving_speed: int) -> int:
+        """速度スライダーの値に対応する 1 フレームあたりの再生ステップ数（指数的に増える）"""
+        level = (self._display_speed(solving_speed) - 1) / 99
+        return max(1, round(MAX_REPLAY_STEPS_PER_FRAME ** level))
+    
+    def advance_replay(self, max_steps: int) -> bool:
+        """最大 max_steps ステップを再生して盤面にまとめて反映する（再生が終わったら False）
+        
+        ステップごとに描画せず、フレームの最後の状態だけを盤面に書き込む。
+        """
+        data = self.replay.read_records(max_steps)
+        if not data:
+            self.stop_replay()
+            return False
+        cells = self._replay_cells
+        apply_records(cells, data)
+        self.replay_steps += len(data) // RECORD_SIZE
+        self.board.board = [cells[row * 9:(row + 1) * 9] for row in range(9)]
+        return True
+    
+    def stop_replay(self):
+        """トレースの再生を終了"""
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+    
     def _draw_grid_lines(self):
         """盤面のグリッド線を描画"""
         for i in range(10):
@@ -95,7 +148,12 @@ class SudokuRenderer:
             for j in range(9):
                 value = self.board.get_value(i, j)
                 if value != 0:
-                    color = self.colors["text_default"] if self.board.is_original_cell(i, j) else self.colors["text_added"]
+                    if self.board.is_conflicting(i, j):
+                        color = self.colors["invalid"]
+                    elif self.board.is_original_cell(i, j):
+                        color = self.colors["text_default"]
+                    else:
+                        color = self.colors["text_added"]
                     text = font.render(str(value), True, color)
                     x = self.origin_x + j * self.cell_size + self.cell_size // 4
                     y = self.origin_y + i * self.cell_size + self.cell_size // 6
@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from board import SudokuBoard
+from canonical import canonicalize
+from solver_registry import AUTO, create_solver
+from solve_limits import SolveLimits, SolveResult, SolveStatus
+from solve_stats import SolveStats
+from file_io import board_to_line, parse_puzzle_line
+
+
+class SolveCache:
+    """正規形をキーにした解答結果の LRU キャッシュ
+    
+    同じ問題だけでなく、数字の付け替え・転置・行や列の入れ替えで移り合う問題も
+    1 回の探索の結果を共有する。キャッシュには正規形の問題の解を保存し、
+    取り出すときに逆変換で元の問題の解に戻す。
+    """
+    
+    def __init__(self, maxsize: int = 4096):
+        """
+        Args:
+            maxsize: 保存する結果の最大数（超えた場合は最も古く使われた結果から捨てる）
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # 正規形 -> 正規形の解（81 文字）、解がなければ None
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def solve(self, board: SudokuBoard, solver_name: str = AUTO, limits: Optional[SolveLimits] = None,
+              stats: Optional[SolveStats] = None) -> SolveResult:
+        """盤面を解き、解けた場合は盤面に解を書き込む（キャッシュにあれば探索しない）
+        
+        上限に達して打ち切った結果はキャッシュしない。
+        
+        Args:
+            board: 解く対象の盤面（重複のない盤面であること）
+            solver_name: キャッシュにない場合に使うソルバー名
+            limits: キャッシュにない場合の探索の上限
+            stats: 指定すると探索の統計（キャッシュから返した場合は cache_hits）を加算する
+        
+        Returns:
+            SolveResult: 結果の種類（キャッシュから返した場合、ノード数は 0）
+        """
+        start_time = time.monotonic()
+        key, transform = canonicalize(board.to_list())
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if stats is not None:
+                stats.cache_hits += 1
+            solution = self._entries[key]
+            status = SolveStatus.SOLVED if solution is not None else SolveStatus.UNSOLVABLE
+            result = SolveResult(status, 0, time.monotonic() - start_time)
+        else:
+            self.misses += 1
+            result, solution = self._solve_canonical(key, solver_name, limits, stats)
+            if result.status in (SolveStatus.SOLVED, SolveStatus.UNSOLVABLE):
+                self._entries[key] = solution
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        
+        if solution is not None:
+            board.board = transform.invert(parse_puzzle_line(solution))
+        return result
+    
+    def clear(self) -> None:
+        """保存した結果と統計を消去"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def _solve_canonical(self, key: str, solver_name: str, limits: Optional[SolveLimits],
+                         stats: Optional[SolveStats]) -> Tuple[SolveResult, Optional[str]]:
+        """正規形の問題を解き、結果と解（81 文字。解けなかった場合は None）を返す"""
+        board = SudokuBoard(parse_puzzle_line(key))
+        result = create_solver(board, solver_name).solve_with_limits(limits, stats=stats)
+        return result, (board_to_line(board.to_list()) if result.solved else None)
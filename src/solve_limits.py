@@ -0,0 +1,106 @@
+"""
+探索の上限（時間・ノード数）と中断トークン
+
+各ソルバーの solve_with_limits() は SolveLimits を受け取り、上限に達するか中断された時点で
+探索を打ち切って SolveResult を返す。上限の確認は LimitChecker がまとめて行う。
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+# 時間と中断トークンを確認するノード数の間隔（毎ノード確認するとオーバーヘッドが大きい）
+CHECK_INTERVAL = 256
+
+
+class SolveStatus:
+    """探索の結果の種類"""
+    SOLVED = "solved"                    # 解が見つかった
+    UNSOLVABLE = "unsolvable"            # 解がないことが確定した
+    BUDGET_EXCEEDED = "budget_exceeded"  # 時間またはノード数の上限に達した
+    CANCELLED = "cancelled"              # 中断トークンで中断された
+    INVALID = "invalid"                  # 問題の形式が不正（一括解答で使う）
+
+
+class CancellationToken:
+    """別スレッドや UI から探索の中断を要求するためのトークン"""
+    
+    def __init__(self, event=None):
+        """
+        Args:
+            event: 中断の状態を保持するイベント（省略時は threading.Event）。
+                   multiprocessing.Event を渡すとプロセス間で中断を共有できる
+        """
+        self._event = event if event is not None else threading.Event()
+    
+    def cancel(self) -> None:
+        """中断を要求する"""
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class SolveLimits(NamedTuple):
+    """探索の上限（None の項目は制限しない）"""
+    timeout: Optional[float] = None              # 探索開始からの制限時間（秒）
+    deadline: Optional[float] = None             # 打ち切る時刻（time.monotonic() の値）
+    max_nodes: Optional[int] = None              # 探索するノード数の上限
+    token: Optional[CancellationToken] = None    # 中断トークン
+
+
+class SolveResult(NamedTuple):
+    """探索の結果"""
+    status: str         # SolveStatus のいずれか
+    nodes: int = 0      # 探索したノード数
+    elapsed: float = 0.0  # 経過時間（秒）
+    
+    @property
+    def solved(self) -> bool:
+        return self.status == SolveStatus.SOLVED
+
+
+class LimitChecker:
+    """探索中に上限と中断を確認するクラス
+    
+    ソルバーはノードを展開するたびに tick() を呼び、None 以外が返ったら探索を打ち切る。
+    """
+    
+    def __init__(self, limits: Optional[SolveLimits] = None):
+        limits = limits or SolveLimits()
+        self.start_time = time.monotonic()
+        self.max_nodes = limits.max_nodes
+        self.token = limits.token
+        self.deadline = limits.deadline
+        if limits.timeout is not None:
+            timeout_deadline = self.start_time + limits.timeout
+            self.deadline = timeout_deadline if self.deadline is None else min(self.deadline, timeout_deadline)
+        self.nodes = 0
+        # 打ち切った理由（打ち切っていなければ None）
+        self.status: Optional[str] = None
+    
+    def tick(self) -> Optional[str]:
+        """ノードを 1 つ数え、探索を打ち切るべきなら SolveStatus を返す
+
+        ノード数の上限に達していた場合は、展開しないノードを数えずに打ち切る（nodes は max_nodes を超えない）。
+        """
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.status = SolveStatus.BUDGET_EXCEEDED
+            return self.status
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.status = self.poll()
+        return self.status
+    
+    def poll(self) -> Optional[str]:
+        """中断トークンと制限時間を確認する"""
+        if self.token is not None and self.token.cancelled:
+            return SolveStatus.CANCELLED
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return SolveStatus.BUDGET_EXCEEDED
+        return None
+    
+    def result(self, status: str) -> SolveResult:
+        """探索の結果を作成"""
+        return SolveResult(status, self.nodes, time.monotonic() - self.start_time)
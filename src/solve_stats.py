@@ -0,0 +1,58 @@
+from typing import Dict, List
+from lang_manager import get_text
+
+
+# 制約伝播の手筋（ConstraintPropagator の適用順）
+TECHNIQUES = ("naked_single", "hidden_single", "locked_candidates", "naked_pair", "hidden_pair")
+
+
+class SolveStats:
+    """探索の統計（ソルバーの solve_with_limits(stats=...) に渡すと加算される）
+    
+    1 つのオブジェクトを複数回の探索に渡すと合計になり、merge() で別の統計を足し合わせられる。
+    """
+    
+    def __init__(self):
+        self.solves = 0              # 探索した盤面の数
+        self.cache_hits = 0          # 解答キャッシュから返した盤面の数
+        self.nodes = 0               # 展開したノード数（数字を置いた回数）
+        self.backtracks = 0          # 行き詰まって前の分岐に戻った回数
+        self.max_depth = 0           # 分岐の深さの最大値
+        # 手筋ごとの適用数（single は確定した数字の数、それ以外は消去した候補の数）
+        self.eliminations: Dict[str, int] = {name: 0 for name in TECHNIQUES}
+        self.propagation_time = 0.0  # 制約伝播にかかった時間（秒）
+        self.search_time = 0.0       # 制約伝播以外の探索にかかった時間（秒）
+    
+    def finish_solve(self, nodes: int, elapsed: float, propagation_time: float) -> None:
+        """1 回の探索の結果を加算する
+        
+        Args:
+            nodes: 展開したノード数
+            elapsed: 探索全体の経過時間（秒）
+            propagation_time: そのうち制約伝播にかかった時間（秒）
+        """
+        self.solves += 1
+        self.nodes += nodes
+        self.search_time += max(0.0, elapsed - propagation_time)
+    
+    def merge(self, other: "SolveStats") -> None:
+        """別の統計を足し合わせる（最大深さは大きい方）"""
+        self.solves += other.solves
+        self.cache_hits += other.cache_hits
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for name, count in other.eliminations.items():
+            self.eliminations[name] = self.eliminations.get(name, 0) + count
+        self.propagation_time += other.propagation_time
+        self.search_time += other.search_time
+    
+    def summary_lines(self) -> List[str]:
+        """詳細出力用の行のリストを返す"""
+        eliminations = ", ".join(f"{name}={count}" for name, count in self.eliminations.items())
+        return [
+            get_text("solver.stats", "solves", None, self.solves, self.cache_hits),
+            get_text("solver.stats", "search", None, self.nodes, self.backtracks, self.max_depth),
+            get_text("solver.stats", "eliminations", None, eliminations),
+            get_text("solver.stats", "time", None, self.propagation_time, self.search_time),
+        ]
@@ -0,0 +1,132 @@
+"""
+探索ステップのトレースファイル
+
+解答の過程（SolveStep の列）を 1 ステップ 2 バイトのバイナリ形式でファイルに書き出し、
+あとから読み出して再生できるようにする。書き込みも読み込みも一定量ずつバッファして行うため、
+数百万ステップのトレースでもメモリに全体を載せない。
+
+ファイル形式:
+    ヘッダー: MAGIC（4 バイト）、VERSION（1 バイト）、初期盤面（81 バイト、行優先、空きマスは 0）
+    ステップ: 1 ステップ 2 バイト（セル番号 row * 9 + col、種類 << 4 | 数字）
+"""
+from typing import BinaryIO, Iterator, List
+from solver import SolveStep
+from lang_manager import get_text
+
+
+MAGIC = b"SDKT"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 1 + 81
+RECORD_SIZE = 2
+
+# ステップの種類の番号
+KIND_CODES = {"place": 0, "undo": 1, "solution": 2}
+CODE_KINDS = {code: kind for kind, code in KIND_CODES.items()}
+PLACE_CODE = KIND_CODES["place"]
+UNDO_CODE = KIND_CODES["undo"]
+
+# この大きさ（バイト）たまるごとにファイルに書き出す
+BUFFER_SIZE = 1 << 16
+
+
+class TraceWriter:
+    """探索ステップをトレースファイルに書き出すクラス（with 文で使う）"""
+    
+    def __init__(self, filepath: str, board: List[List[int]]):
+        """
+        Args:
+            filepath: 書き出すファイルのパス
+            board: 探索開始時の盤面（9x9 の 2 次元リスト）
+        
+        Raises:
+            ValueError: 盤面が 9x9 でない場合
+        """
+        if len(board) != 9:
+            raise ValueError(get_text("trace.errors", "unsupported_size"))
+        self._file: BinaryIO = open(filepath, 'wb')
+        self._file.write(MAGIC + bytes([VERSION]) + bytes(num for row in board for num in row))
+        self._buffer = bytearray()
+        self.steps = 0
+    
+    def write_step(self, step: SolveStep) -> None:
+        """ステップを 1 つ書き出す（"solution" ステップのセル番号は 0 とする）"""
+        cell = step.row * 9 + step.col if step.row >= 0 else 0
+        self._buffer.append(cell)
+        self._buffer.append(KIND_CODES[step.kind] << 4 | step.value)
+        self.steps += 1
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.flush()
+    
+    def flush(self) -> None:
+        self._file.write(self._buffer)
+        self._buffer.clear()
+    
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+    
+    def __enter__(self) -> "TraceWriter":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class TraceReader:
+    """トレースファイルを先頭から順に読み込むクラス（with 文で使う）"""
+    
+    def __init__(self, filepath: str):
+        """
+        Args:
+            filepath: 読み込むファイルのパス
+        
+        Raises:
+            ValueError: トレースファイルの形式でない場合
+        """
+        self._file: BinaryIO = open(filepath, 'rb')
+        header = self._file.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:len(MAGIC)] != MAGIC or header[len(MAGIC)] != VERSION:
+            self._file.close()
+            raise ValueError(get_text("trace.errors", "invalid_trace", None, filepath))
+        cells = header[len(MAGIC) + 1:]
+        # 探索開始時の盤面
+        self.initial_board = [list(cells[row * 9:(row + 1) * 9]) for row in range(9)]
+    
+    def read_records(self, max_steps: int) -> bytes:
+        """最大 max_steps ステップ分の生のレコード（1 ステップ 2 バイト）を読み込む（終端では空）"""
+        return self._file.read(max_steps * RECORD_SIZE)
+    
+    def __iter__(self) -> Iterator[SolveStep]:
+        """残りのステップを SolveStep として順に返す"""
+        while True:
+            data = self.read_records(BUFFER_SIZE // RECORD_SIZE)
+            if not data:
+                return
+            for i in range(0, len(data) - 1, RECORD_SIZE):
+                cell, code = data[i], data[i + 1]
+                kind = CODE_KINDS[code >> 4]
+                if kind == "solution":
+                    yield SolveStep(kind, -1, -1, 0)
+                else:
+                    yield SolveStep(kind, cell // 9, cell % 9, code & 0x0F)
+    
+    def close(self) -> None:
+        self._file.close()
+    
+    def __enter__(self) -> "TraceReader":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def apply_records(cells: List[int], data: bytes) -> None:
+    """生のレコードを 81 要素の盤面（行優先）に順に適用する（再生時にまとめて反映するため）"""
+    for i in range(0, len(data) - 1, RECORD_SIZE):
+        code = data[i + 1]
+        kind = code >> 4
+        if kind == PLACE_CODE:
+            cells[data[i]] = code & 0x0F
+        elif kind == UNDO_CODE:
+            cells[data[i]] = 0
@@ -1,59 +1,284 @@
-import pygame
-import sys
 from board import SudokuBoard
-from typing import Callable, Optional
+from dlx_solver import DLXSolver
+from propagation import ConstraintPropagator, BIT_TO_DIGIT
+from solve_limits import LimitChecker, SolveLimits, SolveResult, SolveStatus
+from solve_stats import SolveStats
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+
+class SolveStep(NamedTuple):
+    """探索の 1 ステップ（kind は "place"・"undo"・"solution" のいずれか）"""
+    kind: str
+    row: int
+    col: int
+    value: int
 
 
 class SudokuSolver:
     """数独を解くためのクラス"""
     
-    def __init__(self, board: SudokuBoard):
+    def __init__(self, board: SudokuBoard, mrv: bool = False, propagate: bool = False):
+        """
+        Args:
+            board: 解く対象の盤面
+            mrv: True の場合、候補数が最も少ないセルから分岐する（MRV モード）。
+                 False の場合は左上から順に空きセルを埋める
+            propagate: True の場合、各分岐の前に ConstraintPropagator で論理的に確定できる
+                       数字を埋めてから探索する（分岐セルは常に候補数最小のセル）
+        """
         self.board = board
+        self.mrv = mrv
+        self.propagate = propagate
+        # 直近の探索で見つかった解の個数
+        self.solution_count = 0
+        # solve_with_limits で指定された統計（探索中のみ設定される）
+        self.stats: Optional[SolveStats] = None
     
-    def solve(self, animate: bool, callback: Optional[Callable] = None, delay: int = 0, game=None) -> bool:
+    def solve(self) -> bool:
         """数独を解く
         
-        Args:
-            animate: アニメーション表示を行うかどうか
-            callback: 盤面更新時のコールバック関数
-            delay: アニメーションの遅延時間（ミリ秒）
-            game: ゲームインスタンス（中断チェック用）
-            
         Returns:
             bool: 解けたかどうか
         """
-        # メインイベントループを維持するために定期的にイベントを処理
-        if animate and callback:
-            pygame.event.pump()
+        return self.solve_with_limits().solved
+    
+    def solve_with_limits(self, limits: Optional[SolveLimits] = None, stats: Optional[SolveStats] = None,
+                          trace=None) -> SolveResult:
+        """時間・ノード数の上限と中断トークンを確認しながら数独を解く
+        
+        上限に達した場合や解がない場合、盤面は元の状態に戻す。
+        探索の様子を表示する場合は iter_steps() でステップを 1 つずつ受け取る。
+        
+        Args:
+            limits: 探索の上限（省略時は制限なし）
+            stats: 指定すると探索の統計を加算する
+            trace: 指定するとすべてのステップを書き出す（solve_trace.TraceWriter）
+        
+        Returns:
+            SolveResult: 結果の種類と探索したノード数
+        """
+        checker = LimitChecker(limits)
+        self.stats = stats
+        propagation_start = stats.propagation_time if stats is not None else 0.0
+        empties = self._empty_cells()
+        status = None
+        for step in self.iter_steps():
+            if trace is not None:
+                trace.write_step(step)
+            if step.kind != "place":
+                continue
+            # 数字を置くたびに上限を確認する
+            status = checker.tick()
+            if status is not None:
+                break
+        
+        if status is None:
+            status = SolveStatus.SOLVED if self.solution_count > 0 else SolveStatus.UNSOLVABLE
+        else:
+            for i, j in empties:
+                self.board.set_value(i, j, 0)
+        
+        result = checker.result(status)
+        if stats is not None:
+            stats.finish_solve(result.nodes, result.elapsed, stats.propagation_time - propagation_start)
+            self.stats = None
+        return result
+    
+    def iter_steps(self, max_solutions: int = 1) -> Iterator[SolveStep]:
+        """明示的なスタックで探索し、盤面への操作を 1 ステップずつ返すジェネレーター
+        
+        呼び出し側は任意の数のステップを進めたり、途中で止めたり（再開・破棄も可能）できる。
+        解が見つかるたびに "solution" ステップを返し、max_solutions 個に達すると
+        盤面をその解の状態のままにして終了する。見つかった解の個数は solution_count に入る。
+        
+        Args:
+            max_solutions: 探索を打ち切る解の個数
+        """
+        self.solution_count = 0
+        if self.propagate:
+            return self._iter_propagated_steps(max_solutions)
+        return self._iter_backtrack_steps(max_solutions)
+    
+    def count_solutions(self, max_solutions: int = 2, solution: Optional[List[List[int]]] = None,
+                        limits: Optional[SolveLimits] = None) -> Optional[int]:
+        """解の個数を max_solutions を上限として数える（盤面は元の状態に戻る）
+        
+        solution にリストを渡すと、最初に見つかった解（盤面と同じ大きさの 2 次元リスト）が格納される。
+        limits を指定した場合、上限に達したら探索を打ち切って None を返す。
+        """
+        empties = self._empty_cells()
+        checker = LimitChecker(limits) if limits is not None else None
+        status = None
+        for step in self.iter_steps(max_solutions):
+            if step.kind == "solution":
+                if solution is not None and self.solution_count == 1:
+                    solution[:] = self.board.to_list()
+            elif checker is not None and step.kind == "place":
+                status = checker.tick()
+                if status is not None:
+                    break
+        for i, j in empties:
+            self.board.set_value(i, j, 0)
+        return self.solution_count if status is None else None
+    
+    def _empty_cells(self) -> List[Tuple[int, int]]:
+        """空きセルの (row, col) のリストを返す"""
+        size = self.board.size
+        return [(i, j) for i in range(size) for j in range(size) if self.board.get_value(i, j) == 0]
+    
+    def _iter_backtrack_steps(self, max_solutions: int) -> Iterator[SolveStep]:
+        """バックトラッキング（左上から順、または MRV）の探索ステップを返す"""
+        board = self.board
+        stats = self.stats
+        # スタックの各要素は [row, col, 未試行の候補マスク]
+        stack = []
+        cell = self._select_cell()
+        if cell is None:
+            self.solution_count = 1
+            yield SolveStep("solution", -1, -1, 0)
+            return
+        stack.append(list(cell))
+        
+        while stack:
+            frame = stack[-1]
+            row, col, mask = frame
+            value = board.get_value(row, col)
+            if value != 0:
+                board.set_value(row, col, 0)
+                yield SolveStep("undo", row, col, value)
+            if mask == 0:
+                # 候補を試し尽くした（候補 0 個のセルもここで即座に失敗する）
+                stack.pop()
+                if stats is not None:
+                    stats.backtracks += 1
+                continue
+            
+            bit = mask & -mask
+            frame[2] = mask ^ bit
+            num = BIT_TO_DIGIT[bit]
+            board.set_value(row, col, num)
+            yield SolveStep("place", row, col, num)
+            
+            cell = self._select_cell()
+            if cell is None:
+                self.solution_count += 1
+                yield SolveStep("solution", -1, -1, 0)
+                if self.solution_count >= max_solutions:
+                    return
+                continue
+            stack.append(list(cell))
+            if stats is not None and len(stack) > stats.max_depth:
+                stats.max_depth = len(stack)
+    
+    def _iter_propagated_steps(self, max_solutions: int) -> Iterator[SolveStep]:
+        """制約伝播で埋められるだけ埋めてから、候補数最小のセルで分岐する探索ステップを返す
+        
+        候補リストは 1 つだけを書き換え、分岐をやり直すときは盤面と候補リストの変更の記録で取り消す
+        （ノードごとに候補リストをコピーしない）。
+        """
+        board = self.board
+        size = board.size
+        stats = self.stats
+        propagator = ConstraintPropagator(board, stats)
+        cands = propagator.initial_candidates()
+        if cands is None:
+            return
+        
+        placed = []
+        start = propagator.checkpoint()
+        # スタックの各要素は [分岐セル, 未試行の候補マスク, 分岐前の記録の位置, 分岐前の placed の長さ]
+        stack = []
+        try:
+            ok = propagator.propagate(cands, placed)
+            for idx in placed:
+                yield SolveStep("place", idx // size, idx % size, board.get_value(idx // size, idx % size))
+            if not ok:
+                yield from self._undo_steps(propagator, cands, placed, start, 0)
+                return
             
-            # 中断チェック
-            if game and not game.solving:
-                return False
+            idx = propagator.select_cell(cands)
+            if idx < 0:
+                self.solution_count = 1
+                yield SolveStep("solution", -1, -1, 0)
+                return
             
-            # UIの更新
-            callback()
+            stack.append([idx, cands[idx], propagator.checkpoint(), len(placed)])
+            while stack:
+                frame = stack[-1]
+                idx, mask, mark, placed_start = frame
+                yield from self._undo_steps(propagator, cands, placed, mark, placed_start)
+                if mask == 0:
+                    stack.pop()
+                    propagator.release()
+                    if stats is not None:
+                        stats.backtracks += 1
+                    continue
+                
+                bit = mask & -mask
+                frame[1] = mask ^ bit
+                ok = propagator.assign(cands, idx, BIT_TO_DIGIT[bit], placed) and propagator.propagate(cands, placed)
+                for placed_idx in placed[placed_start:]:
+                    row, col = divmod(placed_idx, size)
+                    yield SolveStep("place", row, col, board.get_value(row, col))
+                if not ok:
+                    # 伝播で矛盾が見つかった
+                    if stats is not None:
+                        stats.backtracks += 1
+                    continue
+                
+                next_idx = propagator.select_cell(cands)
+                if next_idx < 0:
+                    self.solution_count += 1
+                    yield SolveStep("solution", -1, -1, 0)
+                    if self.solution_count >= max_solutions:
+                        return
+                    continue
+                stack.append([next_idx, cands[next_idx], propagator.checkpoint(), len(placed)])
+                if stats is not None and len(stack) > stats.max_depth:
+                    stats.max_depth = len(stack)
             
-            # 遅延処理（短い間隔で複数回に分けることでUIの応答性を維持）
-            if delay > 0:
-                steps = 10
-                step_delay = max(1, delay // steps)
-                for _ in range(steps):
-                    pygame.time.delay(step_delay)
-                    pygame.event.pump()
-                    if game and not game.solving:
-                        return False
-        
-        # 解法処理
-        for i in range(9):
-            for j in range(9):
-                if self.board.get_value(i, j) == 0:
-                    for num in range(1, 10):
-                        if self.board.is_valid(i, j, num):
-                            self.board.set_value(i, j, num)
-                            
-                            if self.solve(animate, callback, delay, game):
-                                return True
-                                
-                            self.board.set_value(i, j, 0)
-                    return False
-        return True
+            yield from self._undo_steps(propagator, cands, placed, start, 0)
+        finally:
+            # 解が見つかって途中で終える場合も記録は終える（盤面は解を埋めたまま残る）
+            for _ in stack:
+                propagator.release()
+            propagator.release()
+    
+    def _undo_steps(self, propagator: ConstraintPropagator, cands: List[int], placed: List[int],
+                    mark: Tuple[int, int], start: int) -> Iterator[SolveStep]:
+        """記録の位置 mark まで盤面と候補リストを戻し、空に戻した placed[start:] のセルのステップを新しい順に返す"""
+        board = self.board
+        size = board.size
+        undone = [(idx, board.get_value(idx // size, idx % size)) for idx in reversed(placed[start:])]
+        propagator.rollback(cands, mark)
+        del placed[start:]
+        for idx, value in undone:
+            yield SolveStep("undo", idx // size, idx % size, value)
+    
+    def _select_cell(self) -> Optional[Tuple[int, int, int]]:
+        """次に分岐するセルと、その候補のビットマスクを返す"""
+        if self.mrv:
+            return self.board.find_most_constrained()
+        empty = self.board.find_empty()
+        if empty is None:
+            return None
+        row, col = empty
+        return (row, col, self.board.candidates_mask(row, col))
+
+
+def count_solutions(board: SudokuBoard, limit: int = 2, solution: Optional[List[List[int]]] = None,
+                    limits: Optional[SolveLimits] = None) -> Optional[int]:
+    """盤面の解の個数を limit を上限として数える（盤面は変更しない）
+    
+    最も高速な Dancing Links で探索し、解のコピーを作らずに limit 個見つかった時点で打ち切る。
+    
+    Args:
+        board: 対象の盤面
+        limit: 数える解の上限（一意解チェックなら 2）
+        solution: リストを渡すと、最初に見つかった解（盤面と同じ大きさの 2 次元リスト）が格納される
+        limits: 探索の上限（上限に達した場合は None を返す）
+    
+    Returns:
+        Optional[int]: 解の個数（limit 以下）。上限に達して数えきれなかった場合は None
+    """
+    return DLXSolver(board).count_solutions(limit, solution, limits)
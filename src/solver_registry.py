@@ -0,0 +1,90 @@
+from typing import Callable, Dict, List, NamedTuple
+from board import SudokuBoard
+from solver import SudokuSolver
+from dlx_solver import DLXSolver
+from cdcl_solver import CDCLSolver
+from propagation import ConstraintPropagator
+from lang_manager import get_text
+
+
+class SolverEntry(NamedTuple):
+    """登録されたソルバーの情報"""
+    factory: Callable
+    animated: bool  # iter_steps() で探索のステップを 1 つずつ返せる（GUI でアニメーション表示できる）かどうか
+    description: str
+
+
+# 自動選択を表すソルバー名
+AUTO = "auto"
+
+# ヒント数がこれより少ない盤面は探索が中心になるため、伝播の試行をせずに exact cover で解く
+# （9x9 の盤面での値。大きい盤面ではセル数に比例させる）
+AUTO_MIN_CLUES = 25
+
+_registry: Dict[str, SolverEntry] = {}
+
+
+def register_solver(name: str, factory: Callable, animated: bool = False, description: str = "") -> None:
+    """ソルバーを名前で登録する
+    
+    Args:
+        name: ソルバー名（--solver で指定する名前）
+        factory: 盤面を受け取り、solve()/solve_with_limits(limits, stats)/
+                 count_solutions(max_solutions, solution, limits) を持つソルバーを返す関数
+        animated: iter_steps() による探索のアニメーション表示に対応しているかどうか
+        description: ヘルプ用の説明
+    """
+    _registry[name] = SolverEntry(factory, animated, description)
+
+
+def get_solver_names() -> List[str]:
+    """登録されているソルバー名の一覧を返す"""
+    return list(_registry)
+
+
+def supports_animation(name: str) -> bool:
+    """ソルバーがアニメーション表示に対応しているかどうか"""
+    entry = _registry.get(name)
+    return entry is not None and entry.animated
+
+
+def select_solver_name(board: SudokuBoard) -> str:
+    """盤面に応じて最も速いと見込まれるソルバー名を選ぶ
+    
+    ヒント数が十分にあり、naked/hidden single だけで解ける盤面は制約伝播（探索なし）で、
+    それ以外は exact cover（Dancing Links）で解く。
+    """
+    clues = board.count_filled()
+    if clues * 81 < AUTO_MIN_CLUES * board.size ** 2:
+        return "dlx"
+    
+    # single だけを試して探索なしで埋まるかを確かめ、置いた数字は取り消す
+    mark = board.checkpoint()
+    try:
+        probe = ConstraintPropagator(board)
+        cands = probe.initial_candidates()
+        if cands is not None and probe.propagate_singles(cands, []) and probe.select_cell(cands) < 0:
+            return "propagate"
+        return "dlx"
+    finally:
+        board.rollback(mark)
+        board.release()
+
+
+def create_solver(board: SudokuBoard, solver_name: str = AUTO):
+    """ソルバー名に対応するソルバーを作成（"auto" の場合は盤面から自動選択）"""
+    if solver_name == AUTO:
+        solver_name = select_solver_name(board)
+    if solver_name not in _registry:
+        raise ValueError(get_text("solver.errors", "unknown_solver", None, solver_name))
+    return _registry[solver_name].factory(board)
+
+
+register_solver("backtrack", lambda board: SudokuSolver(board), animated=True,
+                description="左上から順に空きマスを埋めるバックトラッキング（GUI のアニメーション用）")
+register_solver("mrv", lambda board: SudokuSolver(board, mrv=True), animated=True,
+                description="候補数の少ないマスから試すバックトラッキング")
+register_solver("propagate", lambda board: SudokuSolver(board, mrv=True, propagate=True), animated=True,
+                description="制約伝播で埋められるマスを埋めてから探索")
+register_solver("dlx", DLXSolver, description="exact cover を Dancing Links で解く")
+register_solver("cdcl", CDCLSolver, description="節学習・バックジャンプ・リスタートで解く（大きい盤面や難問向け）")
@@ -6,6 +6,7 @@ from renderer import SudokuRenderer
 from tkinter import Tk, filedialog
 from datetime import datetime
 from file_io import load_board_from_file
+from solve_trace import TraceReader
 import os
 from lang_manager import get_text, get_language_manager
 
@@ -195,8 +196,8 @@ class SudokuUI:
         return True
     
     def quit_game(self):
-        """ゲームを終了する処理"""
-        self.game.solving = False
+        """ゲームを終了する処理（解答と問題バンクの補充を止めてからウィンドウを閉じる）"""
+        self.game.close()
         pygame.quit()
         sys.exit()
     
@@ -301,15 +302,16 @@ class SudokuUI:
         """ボタンのクリックイベントを処理"""
         # メッセージをクリアする必要はない（handle_eventで処理済み）
         
+        # トレースの再生中にボタンが押されたら再生を終了する
+        self.renderer.stop_replay()
+        
         if self.game.solving:
             # 解答中は「中断」と「終了」ボタンのみ有効
             if button_name == get_text("ui.buttons", "solve"):  # 解答中は「中断」ボタンとして機能
                 self.game.solving = False
                 self.game.event_manager.notify('solve_interrupted')
             elif button_name == get_text("ui.buttons", "exit"):
-                self.game.solving = False
-                pygame.quit()
-                sys.exit()
+                self.quit_game()
             else:
                 # 他のボタンは無効化状態を示すメッセージを表示
                 self.show_temporary_message(get_text("ui.messages", "solving_disabled"), self.ui_config["colors"]["invalid"])
@@ -330,9 +332,7 @@ class SudokuUI:
             if difficulty:  # 難易度が選択された場合のみ
                 self.game.generate_problem(difficulty)
         elif button_name == get_text("ui.buttons", "exit"):
-            self.game.solving = False
-            pygame.quit()
-            sys.exit()
+            self.quit_game()
     
     def _handle_solve_button(self):
         """解くボタンの処理"""
@@ -373,6 +373,16 @@ class SudokuUI:
                 error_msg = str(e)
                 self.show_temporary_message(get_text("ui.messages", "load_failed", "読み込み失敗: {0}", error_msg), self.ui_config["colors"]["invalid"])
     
+    def start_replay(self, filepath: str):
+        """トレースファイルを読み込み、記録された探索の再生を開始する"""
+        try:
+            reader = TraceReader(filepath)
+        except (OSError, ValueError) as e:
+            self.show_temporary_message(get_text("ui.messages", "load_failed", None, str(e)), self.ui_config["colors"]["invalid"])
+            return
+        self.game.load_board(reader.initial_board)
+        self.renderer.start_replay(reader)
+    
     def save_file(self):
         """現在の盤面をファイルに保存"""
         # 現在のウィンドウを記憶
@@ -459,8 +469,7 @@ class SudokuUI:
         while waiting:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit_game()
                 elif event.type == pygame.MOUSEMOTION:
                     # ホバー状態の更新
                     old_hovered = hovered_button
@@ -501,8 +510,7 @@ class SudokuUI:
         while waiting:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit_game()
                 elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
                     waiting = False
     
@@ -621,8 +629,18 @@ class SudokuUI:
     def run(self):
         """メインの GUI ゲームループ"""
         running = True
+        frame_rate = self.ui_config.get("frame_rate", 30)
         while running:
-            self.clock.tick(30)
+            elapsed_ms = self.clock.tick(frame_rate)
+            
+            # 解答中は探索スレッドから届いたステップを反映する
+            self.game.process_solve_steps(elapsed_ms)
+            # トレースの再生中は速度スライダーに応じたステップ数をまとめて反映する
+            if self.renderer.replaying:
+                steps = self.renderer.replay_steps_per_frame(self.game.solving_speed)
+                if not self.renderer.advance_replay(steps):
+                    self.show_temporary_message(get_text("ui.messages", "replay_finished", None, self.renderer.replay_steps),
+                                                self.ui_config["colors"]["valid"])
             
             # ローディング中はスピナーを表示
             if self.loading:
@@ -648,5 +666,4 @@ class SudokuUI:
                     running = False
         
         # ゲーム終了時の処理
-        pygame.quit()
-        sys.exit()
+        self.quit_game()
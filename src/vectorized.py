@@ -0,0 +1,170 @@
+"""
+NumPy による複数盤面の一括処理
+
+N 問の盤面を (N, 81) の uint8 配列として読み込み、候補マスクの計算・重複チェック・
+naked single の伝播をすべての盤面に対してまとめて行う。探索が必要な盤面だけを
+通常のソルバーに渡す。NumPy は任意の依存ライブラリで、インストールされていない場合は
+HAS_NUMPY が False になる。
+"""
+import time
+from typing import Iterable, List, Tuple
+from board import SudokuBoard
+from propagation import UNITS
+from solver_registry import AUTO, create_solver
+from solve_limits import SolveStatus
+from file_io import board_to_line
+from lang_manager import get_text
+
+try:
+    import numpy as np
+except ImportError:  # NumPy がない環境ではこのモジュールの機能は使えない
+    np = None
+
+HAS_NUMPY = np is not None
+
+# 盤面の状態
+NEEDS_SEARCH = 0  # 伝播だけでは埋まらず、探索が必要
+SOLVED = 1        # 伝播だけで解けた
+UNSOLVABLE = 2    # 重複がある、または伝播中に矛盾が見つかった
+
+if HAS_NUMPY:
+    # (27, 9): 各ユニットに含まれるセル番号
+    UNIT_CELLS = np.array(UNITS, dtype=np.intp)
+    # (81,): 各セルが属する行・列・ブロックのユニット番号
+    CELL_ROW_UNIT = np.arange(81) // 9
+    CELL_COL_UNIT = 9 + np.arange(81) % 9
+    CELL_BOX_UNIT = 18 + (np.arange(81) // 27) * 3 + (np.arange(81) % 9) // 3
+    # 数字からビットマスクへの対応表（0 は空きマス）
+    DIGIT_BITS = np.array([0] + [1 << (num - 1) for num in range(1, 10)], dtype=np.uint16)
+    # ビットマスクごとの候補数と、候補が 1 つの場合の数字
+    MASK_POPCOUNT = np.array([bin(mask).count("1") for mask in range(512)], dtype=np.uint8)
+    SINGLE_DIGIT = np.zeros(512, dtype=np.uint8)
+    for _num in range(1, 10):
+        SINGLE_DIGIT[1 << (_num - 1)] = _num
+
+
+def _require_numpy() -> None:
+    if not HAS_NUMPY:
+        raise ImportError(get_text("vectorized.errors", "numpy_required"))
+
+
+def puzzles_to_array(lines: Iterable[str]) -> "np.ndarray":
+    """1 行形式の問題（81 文字、空きマスは 0 または .）の列を (N, 81) の uint8 配列に変換"""
+    _require_numpy()
+    normalized = []
+    for line in lines:
+        line = line.strip().replace('.', '0')
+        if len(line) != 81 or not line.isdigit():
+            raise ValueError(get_text("file_io.errors", "invalid_format"))
+        normalized.append(line)
+    if not normalized:
+        return np.zeros((0, 81), dtype=np.uint8)
+    data = np.frombuffer(''.join(normalized).encode('ascii'), dtype=np.uint8)
+    return (data - ord('0')).reshape(-1, 81)
+
+
+def array_to_lines(grids: "np.ndarray") -> List[str]:
+    """(N, 81) の配列を 81 文字の行のリストに変換"""
+    _require_numpy()
+    text = (grids.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+    return [text[i:i + 81] for i in range(0, len(text), 81)]
+
+
+def candidate_masks(grids: "np.ndarray") -> "np.ndarray":
+    """全盤面の全セルの候補ビットマスクを (N, 81) の uint16 配列で返す（数字のあるセルは 0）"""
+    _require_numpy()
+    bits = DIGIT_BITS[grids]
+    unit_masks = np.bitwise_or.reduce(bits[:, UNIT_CELLS], axis=2)
+    used = unit_masks[:, CELL_ROW_UNIT] | unit_masks[:, CELL_COL_UNIT] | unit_masks[:, CELL_BOX_UNIT]
+    cands = ~used & 0x1FF
+    cands[grids != 0] = 0
+    return cands
+
+
+def find_conflicts(grids: "np.ndarray") -> "np.ndarray":
+    """各盤面に行・列・ブロック内の重複があるかどうかを (N,) の bool 配列で返す
+    
+    SudokuBoard.validate_full_board の結果を反転したものに相当する。
+    """
+    _require_numpy()
+    values = np.sort(grids[:, UNIT_CELLS], axis=2)
+    dup = (values[:, :, 1:] == values[:, :, :-1]) & (values[:, :, 1:] != 0)
+    return dup.any(axis=(1, 2))
+
+
+def propagate_naked_singles(grids: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """naked single を全盤面に対して変化がなくなるまで適用する
+    
+    Returns:
+        (伝播後の盤面 (N, 81), 各盤面の状態 (N,)（NEEDS_SEARCH・SOLVED・UNSOLVABLE）)
+    """
+    _require_numpy()
+    grids = grids.astype(np.uint8, copy=True)
+    status = np.full(len(grids), NEEDS_SEARCH, dtype=np.uint8)
+    status[find_conflicts(grids)] = UNSOLVABLE
+    status[(status == NEEDS_SEARCH) & (grids != 0).all(axis=1)] = SOLVED
+    
+    active = np.flatnonzero(status == NEEDS_SEARCH)
+    while active.size:
+        sub = grids[active]
+        cands = candidate_masks(sub)
+        empty = sub == 0
+        dead = (empty & (cands == 0)).any(axis=1)
+        singles = empty & (MASK_POPCOUNT[cands] == 1)
+        sub = sub + np.where(singles, SINGLE_DIGIT[cands], 0).astype(np.uint8)
+        # 同じユニットで同じ数字が同時に確定した場合も矛盾として扱う
+        dead |= find_conflicts(sub)
+        grids[active] = sub
+        
+        status[active[dead]] = UNSOLVABLE
+        status[active[~dead & (sub != 0).all(axis=1)]] = SOLVED
+        progressed = singles.any(axis=1) & ~dead
+        active = active[progressed & (status[active] == NEEDS_SEARCH)]
+    return grids, status
+
+
+def solve_lines(lines: List[str], solver_name: str = AUTO, cache=None, limits=None,
+                stats=None) -> List[Tuple[str, str]]:
+    """1 行形式の問題をまとめて解き、batch.solve_puzzle_line と同じ形式の (結果の行, 結果の種類) を返す
+    
+    naked single の伝播を全盤面に一括で適用し、それで解けなかった盤面だけを通常のソルバーで
+    limits（solve_limits.SolveLimits）の範囲で解く。cache（solve_cache.SolveCache）を指定した場合は、
+    探索をキャッシュを通して行う。stats（solve_stats.SolveStats）を指定した場合は、一括の伝播を
+    制約伝播の時間と naked single の数に加算する。
+    """
+    _require_numpy()
+    results = [("", SolveStatus.INVALID)] * len(lines)
+    valid_positions = []
+    valid_lines = []
+    for pos, line in enumerate(lines):
+        line = line.strip().replace('.', '0')
+        if len(line) == 81 and line.isdigit():
+            valid_positions.append(pos)
+            valid_lines.append(line)
+    if not valid_lines:
+        return results
+    
+    start_time = time.perf_counter()
+    givens = puzzles_to_array(valid_lines)
+    grids, status = propagate_naked_singles(givens)
+    if stats is not None:
+        stats.propagation_time += time.perf_counter() - start_time
+        stats.eliminations["naked_single"] += int((grids != 0).sum() - (givens != 0).sum())
+    propagated = array_to_lines(grids)
+    for k, pos in enumerate(valid_positions):
+        if status[k] == SOLVED:
+            results[pos] = (propagated[k], SolveStatus.SOLVED)
+        elif status[k] == UNSOLVABLE:
+            results[pos] = (valid_lines[k], SolveStatus.UNSOLVABLE)
+        else:
+            row_major = grids[k].reshape(9, 9).tolist()
+            board = SudokuBoard(row_major)
+            if cache is not None:
+                result = cache.solve(board, solver_name, limits, stats)
+            else:
+                result = create_solver(board, solver_name).solve_with_limits(limits, stats=stats)
+            if result.solved:
+                results[pos] = (board_to_line(board.to_list()), result.status)
+            else:
+                results[pos] = (valid_lines[k], result.status)
+    return results
@@ -0,0 +1,50 @@
+"""
+登録されたすべてのソルバーで、解の個数の数え方（逐次・並列）が同じ結果になることを確認する
+
+python tools/check_solver_engines.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from board import SudokuBoard
+from file_io import parse_puzzle_line
+from parallel_search import ParallelSearch
+from solver_registry import AUTO, create_solver, get_solver_names
+
+# (問題, 期待する解の個数（上限 2）)
+PUZZLES = [
+    ("530070000600195000098000060800060003400803001700020006060000280000419005000080079", 1),
+    ("000000000000000000000000000000000000000000000000000000000000000000000000000000001", 2),
+    ("550070000600195000098000060800060003400803001700020006060000280000419005000080079", 0),
+]
+
+
+def main() -> int:
+    failures = 0
+    with ParallelSearch(2) as search:
+        for name in [AUTO] + get_solver_names():
+            search.solver_name = name
+            for line, expected in PUZZLES:
+                board = SudokuBoard(parse_puzzle_line(line))
+                serial_solution = []
+                serial = expected if name == AUTO else create_solver(board, name).count_solutions(
+                    2, solution=serial_solution)
+                parallel_solution = []
+                parallel = search.count_solutions(board, 2, parallel_solution)
+                ok = serial == expected and parallel == expected and board.to_bytes() == SudokuBoard(
+                    parse_puzzle_line(line)).to_bytes()
+                if expected and parallel_solution:
+                    ok = ok and SudokuBoard(parallel_solution).validate_full_board()
+                if expected and serial_solution:
+                    ok = ok and SudokuBoard(serial_solution).validate_full_board()
+                if not ok:
+                    failures += 1
+                print(f"{name:10} {line[:20]}... serial={serial} parallel={parallel} {'ok' if ok else 'NG'}")
+    print("failures:", failures)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())